@@ -1,5 +1,5 @@
 import cv2
-import numpy as np
+from edge_overlay import EdgeOverlayProcessor
 
 # Open the USB camera (usually index 0, 1, etc.)
 cap = cv2.VideoCapture(0)
@@ -8,6 +8,9 @@ if not cap.isOpened():
     print("Error: Could not open camera.")
     exit()
 
+# Red edges over the dimmed frame, buffers are allocated once and reused every frame
+overlay_processor = EdgeOverlayProcessor(100, 200, mode="color", alpha=0.8, edge_color=(0, 0, 255))
+
 while True:
     # Capture frame-by-frame
     ret, frame = cap.read()
@@ -15,18 +18,8 @@ while True:
         print("Error: Failed to read frame.")
         break
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-    # Detect edges using Canny
-    edges = cv2.Canny(gray, 100, 200)
-
-    # Create a color version of the edges (e.g., red)
-    edge_colored = np.zeros_like(frame)
-    edge_colored[edges != 0] = [0, 0, 255]  # Red edges
-
-    # Overlay edges on the original frame
-    overlay = cv2.addWeighted(frame, 0.8, edge_colored, 1.0, 0)
+    # Detect edges and overlay them on the original frame
+    overlay = overlay_processor.process(frame)
 
     # Display the result
     cv2.imshow("Edge Detection", overlay)
@@ -38,5 +31,3 @@ while True:
 # Release the camera and close all windows
 cap.release()
 cv2.destroyAllWindows()
-
-
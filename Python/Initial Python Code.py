@@ -1,14 +1,28 @@
 
 
-import tkinter as tk
-from tkinter import messagebox
-from tkinter import ttk
 import os
-import cv2
+# TOOL_IMAGING_HEADLESS=1 loads the station without Tk (batch_runner.py, Pi without a display)
+HEADLESS = os.environ.get("TOOL_IMAGING_HEADLESS") == "1"
+if not HEADLESS:
+    import tkinter as tk
+    from tkinter import messagebox
+    from tkinter import ttk
 import time
 from datetime import datetime
-import RPi.GPIO as GPIO
 from threading import Thread
+from camera_pool import CameraPool, CaptureResult, STREAM
+from gpio_backend import get_gpio_backend
+from image_writer import ImageWriterPipeline
+from tool_archive import ArchiveSink
+from capture_catalog import CaptureCatalog, new_run_id, parse_image_path
+from motion_profile import MotionProfile, constant_delays, run_steps
+from capture_plan import compile_plan, run_plan
+from run_journal import RunJournal, ResumePoint, read_journal, cleanup_partial_files
+from axis_state import AxisState
+from step_waveform import StepWaveform
+from settle_detector import SettleDetector
+from tracing import span, traced, tracer
+from ui_events import UIEventChannel, ProgressEstimator, format_eta
 import threading
 
 
@@ -16,6 +30,8 @@ import threading
 # Hardware control flag (False for Windows) so set true on raspberry pi
 RUNNING_ON_RASPBERRY_PI = True
 AUTO_START = False
+# write a Chrome/Perfetto trace of every run next to its images
+TRACE_RUNS = False
 
 # Hardware Configuration
 
@@ -52,36 +68,77 @@ STEPS_PER_REVOLUTION = 200
 # Using the GT2 Pulley: 20 teeth with 12.7mm pitch diameter
 GEAR_RATIO = 20/12.7
 
+# Turntable motion profile, in step sequence entries per second (and per second^2).
+# Start speed matches the old fixed 0.01s step delay, which is known not to stall.
+STEPPER_START_SPEED = 100
+STEPPER_MAX_SPEED = 400
+STEPPER_ACCELERATION = 4000
+STEPPER_PROFILE_SHAPE = "trapezoid"  # or "scurve"
+# visit the flute positions in reverse on every other layer instead of rewinding the turntable
+# between layers (python capture_plan.py --flutes 4 --layers 3 compares both)
+ALTERNATE_TURNTABLE = True
+
 # Camera config
 NUM_CAMERAS = 3
 # USB
 CAMERA_INDICES = [0, 2, 4]
+# Adaptive settling: after a move, watch SETTLE_CAMERA and carry on as soon as consecutive
+# downscaled frames differ by less than SETTLE_THRESHOLD gray levels (mean) for SETTLE_STABLE_FRAMES
+# comparisons. The old fixed sleep times are kept as the timeout.
+ADAPTIVE_SETTLE = True
+SETTLE_CAMERA = CAMERA_INDICES[1]
+SETTLE_THRESHOLD = 1.5
+SETTLE_STABLE_FRAMES = 2
+# Burst capture: read BURST_FRAMES frames per camera and keep the sharpest (1 = single frame).
+# If the best one scores below SHARPNESS_FLOOR the burst is retaken up to MAX_RETAKES times.
+BURST_FRAMES = 3
+SHARPNESS_METHOD = "laplacian"  # or "tenengrad"
+SHARPNESS_FLOOR = 50.0
+MAX_RETAKES = 2
+# frames waiting to be encoded/saved before capture_images has to wait for the writer
+WRITE_QUEUE_SIZE = 16
+# append images to one archive per tool (BASE_DIR/archives/T<tool>) instead of loose JPEGs;
+# python tool_archive.py export ... turns an archive back into files
+ARCHIVE_IMAGES = False
+# every saved image gets a row here (python capture_catalog.py <path> --tool 42 --layer 3 ...)
+CATALOG_FILE = "catalog.sqlite"
+# downscaled copies saved next to every image (<name>.preview.jpg, <name>.thumb.jpg) for browsing
+# and contact sheets (python image_pyramid.py sheet ...); None saves the full image only
+PYRAMID_LEVELS = {"preview": 640, "thumb": 160}
+# frames the driver may queue per camera (CAP_PROP_BUFFERSIZE); all of them are flushed before a capture
+CAMERA_BUFFER_SIZE = 2
+# saved images use the camera's full resolution; settling reads the 640x480 stream and the
+# settle camera switches between the two (formats are negotiated once, then cached). "max" takes
+# the largest size the driver offers, a (width, height) fixes it, None keeps everything at 640x480
+STILL_RESOLUTION = "max"
+# frames dropped after each switch (the first ones after a format change can be corrupt or dark)
+STILL_SWITCH_DISCARD = 1
 
 # Where the images are stored
 if not RUNNING_ON_RASPBERRY_PI:
     BASE_DIR = r"C:\Users\csmid\OneDrive - The Pennsylvania State University\Images"
 else:
     BASE_DIR = "/home/seco-tools-capstone/Desktop"
+# TOOL_IMAGING_BASE_DIR points the images somewhere else (benchmarks, headless runs)
+BASE_DIR = os.environ.get("TOOL_IMAGING_BASE_DIR", BASE_DIR)
 
 # Create base directory (if non existant)
 os.makedirs(BASE_DIR, exist_ok=True)
 
-# Current position of camera (top is 0)
-CAM_YPOS  = 0
-CAM_BIT_TOP_POS = 0
+# one journal per capture run; an interrupted run continues with python run_journal.py resume
+JOURNAL_DIR = os.path.join(BASE_DIR, "runs")
+
+# Camera height limits (top is 0)
 CAM_MIN = 0
 CAM_MAX = 940
-
-if not RUNNING_ON_RASPBERRY_PI:
-    class DummyGPIO:
-        BCM = OUT = HIGH = LOW = IN = None
-        def setmode(self, *args, **kwargs): pass
-        def setwarnings(self, *args, **kwargs): pass
-        def setup(self, *args, **kwargs): pass
-        def output(self, *args, **kwargs): pass
-        def input(self, *args, **kwargs): return 0
-        def cleanup(self, *args, **kwargs): pass
-    GPIO = DummyGPIO()
+# Vertical and turntable positions are counted in steps and saved here after every move, so a
+# new session knows where the cameras are (python axis_state.py shows or resets them)
+AXIS_STATE_FILE = os.path.join(BASE_DIR, "axis_state.json")
+
+# "rpi" drives the real pins, "sim" records every pin transition with a timestamp so motor
+# timing can be measured off the Pi (TOOL_IMAGING_GPIO overrides the choice)
+GPIO_BACKEND = os.environ.get("TOOL_IMAGING_GPIO", "rpi" if RUNNING_ON_RASPBERRY_PI else "sim")
+GPIO = get_gpio_backend(GPIO_BACKEND)
 # GPIO(general-purpose input/output) Setup  handles both incoming and outgoing digital signals. As an input port, it can be used to communicate to the CPU the ON/OFF signals received from switches, or the digital readings received from sensors.
 def setup_gpio():
     GPIO.setmode(GPIO.BCM)
@@ -98,24 +155,59 @@ def setup_gpio():
                   STP_IN1, STP_IN2, STP_IN3, STP_IN4], GPIO.LOW)
 
 class StepperController:
-    def __init__(self, step_pins, step_sequence, steps_per_rev, gear_ratio):
+    def __init__(self, step_pins, step_sequence, steps_per_rev, gear_ratio, profile=None, axis=None):
         self.step_pins = step_pins
         self.step_sequence = step_sequence
         self.steps_per_rev = steps_per_rev
         self.gear_ratio = gear_ratio
         self.step_delay = 0.01
         self.current_step = 0
+        # acceleration profile for moves (None keeps the old fixed step_delay)
+        self.profile = profile
+        # (steps done, missed deadlines, worst lateness) of the last move
+        self.last_move_stats = None
+        self.waveform_cw = StepWaveform(step_sequence, [step_pins])
+        self.waveform_ccw = StepWaveform(step_sequence[::-1], [step_pins])
+        # saved turntable position (AxisState), None to not track it
+        self.axis = axis
+
+    def steps_for(self, degrees):
+        # calculate steps needed to rotate by a specific angle in degrees
+        return int((degrees/360) * self.steps_per_rev )
+
+    def _delays(self, steps):
+        # one delay per entry of the sequence, ramped when a profile is set
+        if self.profile is not None:
+            return self.profile.delays(steps * len(self.waveform_cw))
+        return constant_delays(self.step_delay, steps * len(self.waveform_cw))
 
+    def move_time(self, steps):
+        """Seconds a move of this many steps takes"""
+        return sum(self._delays(steps))
+
+    @traced("stepper.rotate_degrees")
     def rotate_degrees(self, degrees, clockwise=True):
-        # calculate steps needed to rotate by a specific angle in degrees
-        steps = int((degrees/360) * self.steps_per_rev )
-        direction = 1 if clockwise else -1
-        sequence = self.step_sequence if clockwise else self.step_sequence[::-1]
-        for _ in range(steps):
-            for step in sequence:
-                for pin in range(4):
-                    GPIO.output(self.step_pins[pin], step[pin])
-                time.sleep(self.step_delay)
+        self.rotate_steps(self.steps_for(degrees), clockwise)
+
+    def rotate_steps(self, steps, clockwise=True):
+        waveform = self.waveform_cw if clockwise else self.waveform_ccw
+        delays = self._delays(steps)
+
+        def step(i):
+            pins, levels = waveform.batch(i, first=i == 0)
+            GPIO.output(pins, levels)
+
+        if self.axis is not None:
+            self.axis.begin_move("turntable")
+        self.last_move_stats = run_steps(delays, step)
+        if self.axis is not None:
+            self.axis.end_move("turntable", len(delays) if clockwise else -len(delays))
+
+    def position_steps(self):
+        """Saved turntable position in rotate_steps steps, None if unknown"""
+        if self.axis is None or not self.axis.known["turntable"]:
+            return None
+        return self.axis.steps["turntable"] / len(self.waveform_cw)
 
     def stop(self):
         #Disable all coils.
@@ -124,7 +216,7 @@ class StepperController:
         return 0
 
 class ActuatorController:
-    def __init__(self, stepper1_pins, stepper2_pins, step_sequence, steps_per_rev, gear_ratio):#, cam_min, cam_max):
+    def __init__(self, stepper1_pins, stepper2_pins, step_sequence, steps_per_rev, gear_ratio, axis=None):#, cam_min, cam_max):
         # Each actuator now has two vertical stepper motors
         self.stepper1_pins = stepper1_pins
         self.stepper2_pins = stepper2_pins
@@ -134,41 +226,78 @@ class ActuatorController:
         self.step_delay = 0.001
         self.stop_flag = False
         self.current_step = 0
+        # both motors driven from one compiled table: one GPIO.output call per phase
+        self.waveform_up = StepWaveform(step_sequence, [stepper1_pins, stepper2_pins])
+        self.waveform_down = StepWaveform(step_sequence[::-1], [stepper1_pins, stepper2_pins])
+        # saved camera height (AxisState), None to not track it
+        self.axis = axis
+
+    def steps_for(self, degrees):
+        # sequence steps (GPIO patterns) of a move; degrees count passes through the sequence
+        return int((degrees / 360) * self.steps_per_rev * self.gear_ratio) * len(self.waveform_up)
 
+    def degrees_for(self, steps):
+        # inverse of steps_for (steps * 90 / (steps_per_rev * gear_ratio) with the 4 step sequence)
+        return steps / len(self.waveform_up) / (self.steps_per_rev * self.gear_ratio) * 360
+
+    @traced("actuator.move")
     def move(self, degrees, upward=True):
         # Calculate how many steps to move
         steps = int((degrees / 360) * self.steps_per_rev * self.gear_ratio)
-        sequence = self.step_sequence if upward else self.step_sequence[::-1]
+        waveform = self.waveform_up if upward else self.waveform_down
        
         step_count = 0
         degree_count = 0
+        if self.axis is not None:
+            self.axis.begin_move("vertical")
         for _ in range(steps):
             if not self.stop_flag:
-                for step in sequence:
-                    # Apply the same step pattern to both motors
-                    for pin in range(4):
-                       
-                        # Motor 1
-                        GPIO.output(self.stepper1_pins[0], step[0])
-                        GPIO.output(self.stepper1_pins[1], step[1])
-                        GPIO.output(self.stepper1_pins[2], step[2])
-                        GPIO.output(self.stepper1_pins[3], step[3])
-
-                        # Motor 2
-                        GPIO.output(self.stepper2_pins[0], step[0])
-                        GPIO.output(self.stepper2_pins[1], step[1])
-                        GPIO.output(self.stepper2_pins[2], step[2])
-                        GPIO.output(self.stepper2_pins[3], step[3])
-                       
+                for phase in range(len(waveform)):
+                    # Apply the same step pattern to both motors in a single write
+                    pins, levels = waveform.batch(phase, first=step_count == 0)
+                    GPIO.output(pins, levels)
                     time.sleep(self.step_delay)
                     step_count += 1
                    
             else:
                 self.stop()
                 break
-        degree_count = int(round((step_count / (self.steps_per_rev * self.gear_ratio)) * 90))
+        if self.axis is not None:
+            # extending counts away from the top (0), retracting back toward it
+            self.axis.end_move("vertical", step_count if upward else -step_count)
+        degree_count = int(round(self.degrees_for(step_count)))
         return degree_count
 
+    def move_time(self, degrees):
+        """Seconds a full (unstopped) move of this many degrees takes"""
+        return self.steps_for(degrees) * self.step_delay
+
+    def position(self):
+        """Saved camera height in degrees from the top, None if it isn't known"""
+        if self.axis is None or not self.axis.known["vertical"]:
+            return None
+        return self.degrees_for(self.axis.steps["vertical"])
+
+    def set_position(self, degrees=0):
+        """Declare the current height (0 = cameras at the top)"""
+        self.axis.set("vertical", self.steps_for(degrees))
+
+    def move_to(self, degrees):
+        """Move to a height from the top; returns the signed distance moved
+
+        Needs a known position: a short move from wherever the cameras are instead of
+        aligning to the top first.
+        """
+        current = self.position()
+        if current is None:
+            raise RuntimeError("Camera height unknown, align up and set top first")
+        distance = degrees - current
+        if distance > 0:
+            return self.extend(distance)
+        if distance < 0:
+            return -self.retract(-distance)
+        return 0
+
 
     def extend(self, degrees=90):
         #Raise tool holder (both steppers move upward).    
@@ -186,45 +315,54 @@ class ActuatorController:
             GPIO.output(pin, GPIO.LOW)
         return 0
     
+def frame_metadata(score):
+    # stored in the JPEG comment of every saved image
+    if score is None:
+        return None
+    return {"sharpness": f"{score:.1f}", "method": SHARPNESS_METHOD}
+
 class MicroscopeManager:
-    def __init__(self, camera_indices):
+    def __init__(self, camera_indices, camera_factory=None):
         self.cameras = []
         self.camera_indices = camera_indices
+        # cameras stay open for the session; stale buffered frames are flushed with grab()
+        # so only the frame that gets saved is decoded
+        self.pool = CameraPool(camera_indices, width=640, height=480, fourcc="MJPG",
+                               warmup_time=0, warmup_frames=0, buffer_size=CAMERA_BUFFER_SIZE,
+                               camera_factory=camera_factory, still_size=STILL_RESOLUTION,
+                               switch_discard=STILL_SWITCH_DISCARD)
+        # JPEG encoding and SD card writes happen in the background
+        sink = ArchiveSink(os.path.join(BASE_DIR, "archives"), BASE_DIR) if ARCHIVE_IMAGES else None
+        self.writer = ImageWriterPipeline(queue_size=WRITE_QUEUE_SIZE, sink=sink, pyramid=PYRAMID_LEVELS)
+        self.failed_writes = []
+        self.catalog = CaptureCatalog(os.path.join(BASE_DIR, CATALOG_FILE))
+        self.run_id = new_run_id()
+        # watches one camera after each move to end the settle wait early
+        self.settle_detector = SettleDetector(
+            lambda: self.pool.read_stream(SETTLE_CAMERA),
+            flush=lambda: self.pool.flush(SETTLE_CAMERA, STREAM),
+            threshold=SETTLE_THRESHOLD, stable_frames=SETTLE_STABLE_FRAMES
+        )
         self.initialize_cameras()
 
     def initialize_cameras(self):
-        for idx in self.camera_indices:
-            try:
-                WIDTH, HEIGHT = 640, 480
-
-                # open captures
-                camera = cv2.VideoCapture(idx, cv2.CAP_V4L2)
-                
-                camera.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
-                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
-                camera.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-                camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
-
-
-                if camera.isOpened():
-                    self.cameras.append(camera)
-                    print(f"Camera {idx} initialized successfully")
-                else:
-                    print(f"Failed to open camera {idx}")
-            except Exception as e:
-                print(f"Error initializing camera {idx}: {e}")
+        # camera indices that opened, in the same order as camera_indices
+        self.cameras = self.pool.open()
 
-        # check if cameras were initialized
-        if len(self.cameras) != len(self.camera_indices):
-            print("WARNING: Not all cameras were initialized!")
+    @traced("capture_images")
+    def capture_images(self, tool_number, flute_number, layer_number, height, position, camera_num=None, parallel=True):
+        """Capture images from defined cameras
 
-    def capture_images(self, tool_number, flute_number, layer_number, height, position, camera_num=None):
-        """Capture images from defined cameras"""
+        camera_num can be a single camera number or a list of them, and position can be a
+        dict of camera number -> angle when the cameras sit at different angles. All selected
+        cameras are read at the same time unless parallel is False.
+        """
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         date_folder = datetime.now().strftime('%Y-%m-%d')
         tool_folder = f"T{tool_number}_FL{flute_number}_OD{layer_number}"
         folder_path = os.path.join(BASE_DIR, tool_folder)
-        os.makedirs(folder_path, exist_ok=True)
+        if not ARCHIVE_IMAGES:
+            os.makedirs(folder_path, exist_ok=True)
 
         file_paths = []
 
@@ -232,108 +370,210 @@ class MicroscopeManager:
         positions = ["top", "side1", "side2"]
         
         if camera_num is not None:
-            if camera_num < len(self.cameras):
-                cameras_to_use = [(camera_num, self.cameras[camera_num])]
-            else:
-                return []
+            camera_nums = camera_num if isinstance(camera_num, (list, tuple)) else [camera_num]
+            cameras_to_use = [(i, self.cameras[i]) for i in camera_nums if i < len(self.cameras)]
+            if not cameras_to_use:
+                return CaptureResult()
         else:
             cameras_to_use = list(enumerate(self.cameras))
-        for i, camera in cameras_to_use:
-            # Take multiple frames to ensure quality
-            for _ in range(10):
-                ret, frame = camera.read()
+
+        start = time.perf_counter()
+        frames = self.pool.read_many([idx for _, idx in cameras_to_use], parallel=parallel,
+                                     burst=BURST_FRAMES, method=SHARPNESS_METHOD,
+                                     floor=SHARPNESS_FLOOR, retakes=MAX_RETAKES)
+        elapsed = time.perf_counter() - start
+        timings = {idx: seconds for idx, (_, _, seconds, _) in frames.items()}
+        scores = {idx: score for idx, (_, _, _, score) in frames.items() if score is not None}
+
+        for i, idx in cameras_to_use:
+            ret, frame, seconds, score = frames[idx]
+            angle = position[i] if isinstance(position, dict) else position
 
             if ret:
                
                 # "T# FL# OD L# M/AP"
-                file_name = f"{datetime.now().strftime('%Y-%m-%d')}_L{height}_{positions[i]}_{int(position)}deg.jpg"
+                file_name = f"{datetime.now().strftime('%Y-%m-%d')}_L{height}_{positions[i]}_{int(angle)}deg.jpg"
                 file_path = os.path.join(folder_path, file_name)
 
-                # save the image
-                cv2.imwrite(file_path, frame)
+                # queue the image to be saved (blocks only if the writer is far behind)
+                self.writer.submit(frame, file_path, metadata=frame_metadata(score))
+                self.catalog.add(tool_number, file_path, flute=flute_number, layer=layer_number,
+                                 height=height, angle=angle, camera=idx, position=positions[i],
+                                 sharpness=score, run_id=self.run_id)
                 file_paths.append(file_path)
-                print(f"Image captured: {file_path}")
+                print(f"Image captured: {file_path} ({seconds * 1000:.0f} ms)")
             else:
                 print(f"Failed to capture image from camera {i}")
 
-        return file_paths
+        return CaptureResult(file_paths, timings, elapsed, scores)
+
+    def wait_until_still(self, timeout):
+        """Block until the settle camera sees no more motion (at most timeout seconds)"""
+        return self.settle_detector.wait(timeout)
+
+    @traced("flush_writes")
+    def flush_writes(self):
+        """Wait for every queued image to be saved; returns [(path, error)] for the ones that failed"""
+        self.failed_writes = self.writer.flush()
+        if self.writer.last_failed_levels:
+            # the full images are saved, only some downscaled copies are missing
+            print(f"{len(self.writer.last_failed_levels)} preview/thumbnail images failed, "
+                  f"python image_pyramid.py backfill <folder> makes them again")
+        # images that were never saved don't belong in the catalog
+        if self.failed_writes:
+            self.catalog.remove([path for path, _ in self.failed_writes])
+        self.catalog.commit()
+        return self.failed_writes
+
+    def start_run(self):
+        """New run id for the catalog rows of the next captures"""
+        self.run_id = new_run_id()
+        return self.run_id
+
+    def image_exists(self, file_path):
+        """True if the image was saved (as a file, or in its tool archive)"""
+        if self.writer.sink is not None:
+            return self.writer.sink.contains(file_path)
+        return os.path.exists(file_path)
 
     def close(self):
         """Release all cameras"""
-        for camera in self.cameras:
-            camera.release()
+        self.writer.close()
+        self.catalog.close()
+        self.pool.close()
         print("All cameras released")
 
 
-def automated_capture_sequence(tool_number, flute_number, layer_number, cameras, actuator, stepper):
-    #run  the automated capture sequence
+def settle(seconds, cameras=None):
+    # wait for vibration to die down after a move; with adaptive settling the fixed time is only
+    # the upper bound and we carry on as soon as the camera image stops changing
+    with span("settle", seconds=seconds):
+        if ADAPTIVE_SETTLE and cameras is not None:
+            cameras.wait_until_still(seconds)
+        else:
+            time.sleep(seconds)
+
+@traced("automated_capture_sequence")
+def automated_capture_sequence(tool_number, flute_number, layer_number, cameras, actuator, stepper, progress=None,
+                               journal_path=None):
+    #run  the automated capture sequence; progress(done, total, message) is called after every capture
     try:
         angle_increment = 95/(int(flute_number))
 
-        all_file_paths = []
-        
-        time.sleep(0.5)
-        #tracks height of camera needed to revert to
-        cam_height = 0
-        cam_height += actuator.extend(900)
-       
-        # initial positioning by starting with tool fully down
-        image_paths = cameras.capture_images(tool_number, flute_number, layer_number, 0, 0, 0)
-        all_file_paths.extend(image_paths)
-        # wait for stability 
-        time.sleep(0.5)
-        
-        for x in range(int(layer_number)):
-            current_angle1 = 0
-            current_angle2 = 180
-            cam_height -= actuator.retract(200/int(layer_number))
-          
-            for position in range(int(flute_number)):
-                current_angle1 += 180/int(flute_number)
-                current_angle2 += 180/int(flute_number)
-                current_height = x
-               
-                # capture images from side cameras
-            
-                image_paths = cameras.capture_images(tool_number, flute_number, layer_number, current_height, current_angle1, 1)
-                all_file_paths.extend(image_paths)
-                image_paths = cameras.capture_images(tool_number, flute_number, layer_number, current_height, current_angle2, 2)
-                all_file_paths.extend(image_paths)
-
-                # rotate to next position             
-                stepper.rotate_degrees(angle_increment)
-                
+        run_id = cameras.start_run()
+        print(f"Run {run_id}")
 
-                #wait
-                time.sleep(0.3)
-            #reverse rotation   
-            for position in range(int(flute_number)):
-                stepper.rotate_degrees(angle_increment, False)
-                
-        time.sleep(.5)
-        
-        cam_height -= actuator.retract(cam_height)   
-        return all_file_paths
+        # every move, settle and capture of the run, in the order they happen
+        plan = compile_plan(flute_number, layer_number, alternate=ALTERNATE_TURNTABLE)
+        journal = RunJournal(journal_path or os.path.join(JOURNAL_DIR, f"{run_id}.jsonl"))
+        try:
+            journal.start(run_id, tool_number, flute_number, layer_number, len(plan), alternate=ALTERNATE_TURNTABLE,
+                          turntable_origin=stepper.position_steps())
+            all_file_paths = run_plan(plan, tool_number, flute_number, layer_number,
+                                      cameras, actuator, stepper, settle, angle_increment, progress, journal=journal)
+            return finish_run(cameras, journal, all_file_paths)
+        finally:
+            journal.close()
         
         
     except Exception as e:
         print(f"Error during capture sequence: {e}")
         raise e
 
-class CustomThread(Thread):
-    def __init__(self, group=None, target=None, name=None, args=(), kwargs={}, verbose=None):
-        # Initializing the Thread class
-        super().__init__(group, target, name, args, kwargs)
-        self._return = None
-
-    # Overriding the Thread.run function
-    def run(self):
-        if self._target is not None:
-            self._return = self._target(*self._args, **self._kwargs)
-
-    def join(self):
-        super().join()
-        return self._return
+def finish_run(cameras, journal, all_file_paths):
+    """Wait for the writes of a run and mark its journal done; returns the saved paths"""
+    # barrier: the run isn't done until every image is on disk
+    failed_paths = {path for path, _ in cameras.flush_writes()}
+    all_file_paths = [path for path in all_file_paths if path not in failed_paths]
+
+    for idx, stats in cameras.pool.freshness_report().items():
+        print(f"Camera {idx}: {stats['avg_flushed']:.1f} stale frames flushed in {stats['avg_ms']:.1f} ms per capture")
+    for idx, stats in cameras.pool.switch_report().items():
+        if stats["switches"]:
+            print(f"Camera {idx}: {stats['switches']} stream/still switches, {stats['avg_ms']:.1f} ms avg, "
+                  f"{stats['max_ms']:.1f} ms max")
+    if failed_paths:
+        # left unfinished so a resume retakes the missing images
+        print(f"{len(failed_paths)} images failed to save, resume {journal.path} to retake them")
+    else:
+        journal.finish(len(all_file_paths))
+    return all_file_paths
+
+@traced("resume_capture_sequence")
+def resume_capture_sequence(journal_path, cameras, actuator, stepper, progress=None):
+    """Continue an interrupted run from its journal; returns the paths of the whole run"""
+    point = ResumePoint(read_journal(journal_path), exists=cameras.image_exists)
+    start = point.start
+    if point.finished:
+        print(f"{journal_path} already finished")
+        return point.files
+    tool_number, flute_number, layer_number = start["tool"], start["flute"], start["layer"]
+    angle_increment = 95/(int(flute_number))
+
+    # catalog rows keep the interrupted run's id
+    cameras.run_id = start["run_id"]
+    plan = compile_plan(flute_number, layer_number, alternate=start.get("alternate", True))
+    print(f"Resuming run {cameras.run_id} at step {point.index}/{len(plan)} ({len(point.files)} images kept)")
+
+    # half-written images and the rows of images that get taken again
+    folder = os.path.join(BASE_DIR, f"T{tool_number}_FL{flute_number}_OD{layer_number}")
+    removed = cleanup_partial_files([folder] + [os.path.dirname(path) for path in point.files])
+    if removed:
+        print(f"Removed {removed} partial files")
+    cameras.catalog.remove(point.redo_files)
+    # rows still buffered when the run stopped were lost with it
+    known = {row["path"] for row in cameras.catalog.query(run_id=cameras.run_id)}
+    for path in point.files:
+        fields = parse_image_path(path)
+        if path not in known and fields is not None:
+            cameras.catalog.add(path=path, run_id=cameras.run_id, **fields)
+
+    journal = RunJournal(journal_path)
+    try:
+        journal.resume(point.index, point.cam_height, point.turntable)
+        file_paths = run_plan(plan, tool_number, flute_number, layer_number, cameras, actuator, stepper,
+                              settle, angle_increment, progress, journal=journal, resume=point)
+        return finish_run(cameras, journal, point.files + file_paths)
+    finally:
+        journal.close()
+
+def create_motion():
+    """Build the actuator and turntable controllers (no GPIO setup, no cameras)"""
+    axis = AxisState(AXIS_STATE_FILE)
+    if axis.lost:
+        print(f"The {axis.lost} axis was moving when the station stopped, its position is unknown")
+    stepper = StepperController(
+        step_pins=[STP_IN1, STP_IN2, STP_IN3, STP_IN4],
+        step_sequence=STEP_SEQ,
+        steps_per_rev=STEPS_PER_REVOLUTION,
+        gear_ratio=GEAR_RATIO,
+        profile=MotionProfile(STEPPER_MAX_SPEED, STEPPER_ACCELERATION,
+                              STEPPER_START_SPEED, STEPPER_PROFILE_SHAPE),
+        axis=axis
+    )
+    actuator = ActuatorController(
+        stepper1_pins=[VERT_STP1_BLACK, VERT_STP1_GREEN, VERT_STP1_RED, VERT_STP1_BLUE],
+        stepper2_pins=[VERT_STP2_BLACK, VERT_STP2_GREEN, VERT_STP2_RED, VERT_STP2_BLUE],
+        step_sequence=STEP_SEQ,
+        steps_per_rev=STEPS_PER_REVOLUTION,
+        gear_ratio=GEAR_RATIO,
+        axis=axis
+    )
+    # positions are saved in GPIO patterns and shown in the degrees the controllers are driven in:
+    # a step is one pass through the sequence, steps_for(360) of them per 360 degrees
+    axis.scales = {"vertical": actuator.degrees_for(1),
+                   "turntable": 360 / (stepper.steps_for(360) * len(stepper.waveform_cw))}
+    return actuator, stepper
+
+def create_hardware(camera_factory=None):
+    """Set up GPIO and build the camera, actuator and turntable controllers"""
+    # set up GPIO
+    if RUNNING_ON_RASPBERRY_PI:
+        setup_gpio()
+
+    actuator, stepper = create_motion()
+    cameras = MicroscopeManager(CAMERA_INDICES, camera_factory=camera_factory)
+    return cameras, actuator, stepper
 
 class ToolInterface:
     def __init__(self, cam_min):#, cam_max):
@@ -346,30 +586,19 @@ class ToolInterface:
         self.cam_min = cam_min
         self.has_aligned_up = False 
       
-        # set up GPIO
-        if RUNNING_ON_RASPBERRY_PI:
-            setup_gpio()
-
-        # initialize hardware controllers
-        self.stepper = StepperController(
-            step_pins=[STP_IN1, STP_IN2, STP_IN3, STP_IN4],
-            step_sequence=STEP_SEQ,
-            steps_per_rev=STEPS_PER_REVOLUTION,
-            gear_ratio=GEAR_RATIO
-        )
-        
-       # self.actuator = ActuatorController(ACT_IN1, ACT_IN2)  OLD ACTUATOR
-        self.actuator = ActuatorController(
-                stepper1_pins=[VERT_STP1_BLACK, VERT_STP1_GREEN, VERT_STP1_RED, VERT_STP1_BLUE],
-                stepper2_pins=[VERT_STP2_BLACK, VERT_STP2_GREEN, VERT_STP2_RED, VERT_STP2_BLUE],
-            step_sequence=STEP_SEQ,
-            steps_per_rev=STEPS_PER_REVOLUTION,
-            gear_ratio=GEAR_RATIO
-        )
-        self.cameras = MicroscopeManager(CAMERA_INDICES)
+        # set up GPIO and initialize hardware controllers
+        self.cameras, self.actuator, self.stepper = create_hardware()
+        # a height saved by the last session makes aligning up unnecessary
+        self.has_aligned_up = self.actuator.position() is not None
 
          # GUI elements
         self.create_widgets()
+        # worker threads never touch Tk directly, they post to this channel instead
+        self.events = UIEventChannel(self.window)
+        self.events.on("status", self.status_text.set)
+        self.events.on("progress", self.show_progress)
+        self.events.start()
+        self.estimator = ProgressEstimator()
         if AUTO_START:
             self.window.after(1000, self.auto_start)   #for autostart
 
@@ -398,11 +627,20 @@ class ToolInterface:
         # status display
         self.status_text = tk.StringVar()
         self.status_text.set("Ready to start. Press 'align up/down' to move cameras. Press again to stop")
+        if self.actuator.position() is not None:
+            self.status_text.set(f"Ready to start, cameras {self.actuator.position():.0f} degrees from the top "
+                                 f"(saved position). Press 'align up/down' to move cameras")
         self.status_label = tk.Label(self.window, textvariable=self.status_text,
                                     bd=1, relief=tk.SUNKEN, anchor=tk.W)
         # ew is parameter in Tinker GUI ew aligns the widget to both left and right edges, making it stretch horizontally across its grid cell
         self.status_label.grid(row=6, column=0, columnspan=4, sticky="ew", padx=0, pady=0)
 
+        # progress of the imaging run
+        self.progress_bar = ttk.Progressbar(self.window, mode="determinate", maximum=1.0)
+        self.progress_bar.grid(row=7, column=0, columnspan=4, sticky="ew", padx=0, pady=2)
+        self.eta_text = tk.StringVar()
+        tk.Label(self.window, textvariable=self.eta_text, anchor=tk.W).grid(row=7, column=4, columnspan=2, sticky="w")
+
         # control buttons
         self.start_button = tk.Button(self.window, text="Start Imaging", command=self.start_process)
         self.start_button.grid(row=5, column=0, padx=1, pady=10)
@@ -423,16 +661,10 @@ class ToolInterface:
         self.exit_button.grid(row=5, column=5, padx=1, pady=10)
 
     def align_up(self):
-        global CAM_YPOS
         if not self.align_bool:# and CAM_YPOS >= self.cam_min and not self.top:
             # Start retracting in background thread
             self.bottom = False
-            self.move_threadu = CustomThread(
-                target=self.actuator.retract,
-                args=(2000,),
-                #daemon=True
-            )
-            self.move_threadu.start()
+            self.move_threadu = self.start_move(self.actuator.retract, self.finish_align_up)
 
             self.align_bool = True
             self.up_stat = True
@@ -440,58 +672,77 @@ class ToolInterface:
             
 
         elif self.up_stat:# and not self.top: #only disable motor when moving UP
-            # Second press → stop
+            # Second press → stop; the move thread reports back through finish_align_up
             self.actuator.stop_flag = True    # tell actuator to stop
-            result = self.move_threadu.join()
-            CAM_YPOS -= result
-            if CAM_YPOS <= self.cam_min: 
-                CAM_YPOS = self.cam_min           
-            self.align_bool = False
-            self.alignu_button.config(text="Align Up")
-            self.has_aligned_up = True 
+            self.alignu_button.config(state=tk.DISABLED)
+
+    def finish_align_up(self, result):
+        # aligned up as far as it goes: that is the top unless the saved height is still above it
+        position = self.actuator.position()
+        if position is None or position <= self.cam_min:
+            self.actuator.set_position(self.cam_min)
+        self.align_bool = False
+        self.alignu_button.config(text="Align Up", state=tk.NORMAL)
+        self.has_aligned_up = True 
 
     def align_down(self):
-        global CAM_YPOS
         if not self.align_bool:# and CAM_YPOS <= self.cam_max and not self.bottom:
             self.top = False
-        # Start retracting in background thread
-            self.move_threadd = CustomThread(
-                target=self.actuator.extend,
-                
-                args=(2000,),
-                #daemon=True
-            )
-            self.move_threadd.start()
+        # Start extending in background thread
+            self.move_threadd = self.start_move(self.actuator.extend, self.finish_align_down)
 
             self.align_bool = True
             self.up_stat = False
             self.alignd_button.config(text="STOP Align Down")
 
         elif not self.up_stat:# and not self.bottom: # only disable motor when moving DOWN
-            # Second press → stop
+            # Second press → stop; the move thread reports back through finish_align_down
             self.actuator.stop_flag = True    # tell actuator to stop
-            result = self.move_threadd.join()
-            
-            CAM_YPOS += result
-            
-                     
-            self.align_bool = False
-            self.alignd_button.config(text="Align Down")
+            self.alignd_button.config(state=tk.DISABLED)
+
+    def finish_align_down(self, result):
+        self.align_bool = False
+        self.alignd_button.config(text="Align Down", state=tk.NORMAL)
+
+    def start_move(self, move, on_done):
+        # run an align move off the Tk thread; on_done(result) runs on the Tk thread when it ends
+        def run():
+            result = 0
+            try:
+                result = move(2000)
+            except Exception as e:
+                self.update_status(f"Move failed: {e}")
+            finally:
+                self.events.call(on_done, result)
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        return thread
 
     def set_top(self): # sets the 0 position (manual)
-        global CAM_YPOS
-        CAM_YPOS = 0
+        self.actuator.set_position(0)
+        self.has_aligned_up = True
         self.update_status("Current position set as top.")
 
-    def bit_top(self): # will save in folder in the future
-        global CAM_BIT_TOP_POS, CAM_YPOS
-        CAM_BIT_TOP_POS = CAM_YPOS
-        self.update_status(f"Top Position Saved: {CAM_BIT_TOP_POS}")
+    def bit_top(self): # saved with the axis positions
+        axis = self.actuator.axis
+        axis.mark("bit_top")
+        position = self.actuator.position()
+        self.update_status(f"Top Position Saved: {position:.0f} degrees" if position is not None
+                           else "Top Position Saved (height unknown, set top first)")
 
     def update_status(self, message):
-        # update status display
-        self.status_text.set(message)
-        self.window.update()
+        # safe from any thread, the Tk loop picks it up on its next drain
+        self.events.status(message)
+
+    def report_progress(self, done, total, message=None):
+        # progress callback for automated_capture_sequence (runs on the imaging thread)
+        self.events.progress(done, total, message)
+
+    def show_progress(self, done, total, message=None):
+        self.progress_bar["value"] = done / total if total else 0
+        self.eta_text.set(format_eta(self.estimator.eta(done, total)))
+        if message:
+            self.status_text.set(message)
 
     def start_process(self):
         # start the imaging process in a separate thread
@@ -543,35 +794,64 @@ class ToolInterface:
         try:
             start_time = time.time()
             self.update_status("Starting automated capture sequence...")
+            self.estimator.reset()
+            self.report_progress(0, 1)
 
             # run the capture sequence
-            image_paths = automated_capture_sequence(
-                tool_number, flute_number, layer_number,
-                self.cameras, self.actuator, self.stepper
-            )
+            if TRACE_RUNS:
+                tracer.start()
+            try:
+                image_paths = automated_capture_sequence(
+                    tool_number, flute_number, layer_number,
+                    self.cameras, self.actuator, self.stepper,
+                    progress=self.report_progress
+                )
+            finally:
+                if TRACE_RUNS:
+                    tracer.stop()
+            if TRACE_RUNS:
+                # trace goes next to the images (open in ui.perfetto.dev or chrome://tracing)
+                trace_folder = os.path.dirname(image_paths[0]) if image_paths else BASE_DIR
+                trace_path = os.path.join(trace_folder, f"trace_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+                tracer.export_chrome(trace_path)
+                print(f"Trace written to {trace_path}")
 
             elapsed_time = time.time() - start_time
+            failed_writes = self.cameras.failed_writes
             self.update_status(f"Imaging complete! {len(image_paths)} images captured in {elapsed_time:.1f} seconds")
 
             # re-enable start button
-            self.window.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            self.events.call(lambda: self.start_button.config(state=tk.NORMAL))
 
             # completion message
-            self.window.after(0, lambda: messagebox.showinfo(
-                "Process Complete",
-                f"Successfully captured {len(image_paths)} images!\n"
-                f"Total time: {elapsed_time:.1f} seconds"
-            ))
+            if failed_writes:
+                failed_list = "\n".join(os.path.basename(path) for path, _ in failed_writes[:5])
+                self.events.call(lambda: messagebox.showwarning(
+                    "Process Complete",
+                    f"Captured {len(image_paths)} images, but {len(failed_writes)} could not be saved:\n"
+                    f"{failed_list}\n"
+                    f"Total time: {elapsed_time:.1f} seconds"
+                ))
+            else:
+                self.events.call(lambda: messagebox.showinfo(
+                    "Process Complete",
+                    f"Successfully captured {len(image_paths)} images!\n"
+                    f"Total time: {elapsed_time:.1f} seconds"
+                ))
 
         except Exception as e:
             self.update_status(f"Error: {str(e)}")
-            self.window.after(0, lambda: messagebox.showerror("Error", f"Imaging failed: {str(e)}"))
-            self.window.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            error = str(e)
+            self.events.call(lambda: messagebox.showerror(
+                "Error", f"Imaging failed: {error}\n\nContinue the run with: python run_journal.py resume"))
+            self.events.call(lambda: self.start_button.config(state=tk.NORMAL))
 
     def cleanup_and_exit(self):
         # clean up resources and exit
         try:
-            self.update_status("Cleaning up...")
+            self.events.stop()
+            self.status_text.set("Cleaning up...")
+            self.window.update_idletasks()
             self.cameras.close()
             GPIO.cleanup()
             self.window.destroy()
@@ -0,0 +1,138 @@
+import os
+import json
+import argparse
+import threading
+from datetime import datetime
+
+AXES = ("vertical", "turntable")
+
+
+class AxisState:
+    """Absolute position of the vertical axis and the turntable, kept across restarts
+
+    Positions are counted in steps of the step sequence (one GPIO pattern = one step, the
+    finest move the controllers make; a full motor step with a full-step sequence) and saved
+    to a JSON file after every move, so a new session knows where the cameras are without
+    aligning up first. The file also records which axis is moving: if the power goes during a
+    move, that axis is unknown on the next start until it is set again. scales converts steps
+    to the degrees each controller is driven in; every scale has to be per that same step.
+    """
+
+    def __init__(self, path, scales=None):
+        self.path = path
+        self.scales = scales or {}
+        self.lock = threading.Lock()
+        self.steps = {"vertical": 0, "turntable": 0}
+        # the vertical axis has to be set once (align up, set top); the turntable counts from
+        # wherever it was first used
+        self.known = {"vertical": False, "turntable": True}
+        self.marks = {}
+        self.moving = None
+        self.lost = None
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            for axis in AXES:
+                self.steps[axis] = data[axis]["steps"]
+                self.known[axis] = data[axis]["known"]
+            self.marks = data.get("marks", {})
+            if data.get("moving") in self.known:
+                # interrupted mid-move: the count no longer matches the hardware
+                self.lost = data["moving"]
+                self.known[self.lost] = False
+                self._save()
+
+    def _save(self):
+        data = {axis: {"steps": self.steps[axis], "known": self.known[axis]} for axis in AXES}
+        data.update(moving=self.moving, marks=self.marks, updated=datetime.now().isoformat(timespec="seconds"))
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def begin_move(self, axis):
+        with self.lock:
+            self.moving = axis
+            self._save()
+
+    def end_move(self, axis, steps):
+        """Record a finished (or stopped) move of steps, negative for down/counterclockwise"""
+        with self.lock:
+            self.steps[axis] += steps
+            self.moving = None
+            self._save()
+
+    def set(self, axis, steps=0):
+        """Declare the current position of an axis (e.g. 0 when the cameras are at the top)"""
+        with self.lock:
+            self.steps[axis] = steps
+            self.known[axis] = True
+            self._save()
+
+    def forget(self, axis):
+        with self.lock:
+            self.known[axis] = False
+            self._save()
+
+    def mark(self, name, axis="vertical"):
+        """Remember the current position of an axis under a name (e.g. the top of the bit)"""
+        with self.lock:
+            self.marks[name] = self.steps[axis]
+            self._save()
+
+    def position(self, axis):
+        """Position in the axis' units, None if it isn't known"""
+        if not self.known[axis]:
+            return None
+        return self.steps[axis] * self.scales.get(axis, 1.0)
+
+    @property
+    def vertical_degrees(self):
+        return self.position("vertical")
+
+    @property
+    def turntable_degrees(self):
+        return self.position("turntable")
+
+    def describe(self):
+        parts = []
+        for axis in AXES:
+            position = self.position(axis)
+            parts.append(f"{axis} {position:.2f} deg ({self.steps[axis]} steps)" if position is not None
+                         else f"{axis} unknown")
+        for name, steps in self.marks.items():
+            parts.append(f"{name} {steps * self.scales.get('vertical', 1.0):.2f} deg")
+        return ", ".join(parts)
+
+
+def main():
+    from station_loader import load_station
+
+    parser = argparse.ArgumentParser(description="Show or reset the saved axis positions")
+    parser.add_argument("--script", default="initial", help="initial or a path to a station script")
+    parser.add_argument("--set-top", action="store_true", help="the cameras are at the top right now")
+    parser.add_argument("--zero-turntable", action="store_true", help="count the turntable from here")
+    parser.add_argument("--forget", action="store_true", help="make the next session align up again")
+    args = parser.parse_args()
+
+    # only the motion controllers are built, nothing moves
+    station = load_station(args.script, gpio="sim", headless=True)
+    actuator, stepper = station.create_motion()
+    axis = actuator.axis
+    if args.set_top:
+        axis.set("vertical", 0)
+    if args.zero_turntable:
+        axis.set("turntable", 0)
+    if args.forget:
+        axis.forget("vertical")
+    if axis.lost:
+        print(f"The {axis.lost} axis was moving when the station stopped, its position is unknown")
+    print(f"{axis.path}: {axis.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import os
+import csv
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime
+from station_loader import load_station
+from run_journal import ResumePoint, read_journal
+
+
+def load_manifest(path):
+    """Tools to image from a CSV (columns tool, flute, layer) or a JSON list of objects"""
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for i, row in enumerate(rows):
+        try:
+            jobs.append(parse_job(row))
+        except ValueError as e:
+            raise ValueError(f"{path} entry {i + 1}: {e}")
+    return jobs
+
+
+def parse_job(row):
+    """Job fields from a manifest row or request body; ValueError if one is missing or invalid"""
+    # short CSV rows and JSON nulls give None, which counts as missing
+    row = {key.strip().lower(): "" if value is None else str(value).strip() for key, value in row.items() if key}
+    missing = [key for key in ("tool", "flute", "layer") if not row.get(key)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    for key in ("flute", "layer"):
+        if not row[key].isdigit() or int(row[key]) < 1:
+            raise ValueError(f"{key} must be a positive whole number, got {row[key]!r}")
+    return {"tool": row["tool"], "flute": row["flute"], "layer": row["layer"]}
+
+
+class JobQueue:
+    """Tools waiting to be imaged, saved to a JSON file after every change
+
+    Each job is pending, running, done or failed. A job still marked running when the queue
+    is loaded was interrupted (crash, power cut) and goes back to pending, so restarting the
+    runner picks up where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.jobs = json.load(f)
+            for job in self.jobs:
+                if job["status"] == "running":
+                    job["status"] = "pending"
+                    job["interrupted"] = job.get("interrupted", 0) + 1
+            self._save()
+
+    def _save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.jobs, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, jobs):
+        """Queue new jobs (dicts with tool, flute, layer); returns them with their ids"""
+        with self.lock:
+            next_id = max((job["id"] for job in self.jobs), default=0) + 1
+            added = []
+            for job in jobs:
+                job = dict(job, id=next_id, status="pending",
+                           queued=datetime.now().isoformat(timespec="seconds"))
+                self.jobs.append(job)
+                added.append(job)
+                next_id += 1
+            self._save()
+        return added
+
+    def next_pending(self):
+        """Mark the oldest pending job running and return it (None when there is nothing left)"""
+        with self.lock:
+            for job in self.jobs:
+                if job["status"] == "pending":
+                    job["status"] = "running"
+                    job["started"] = datetime.now().isoformat(timespec="seconds")
+                    self._save()
+                    return dict(job)
+        return None
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            for job in self.jobs:
+                if job["id"] == job_id:
+                    job.update(fields)
+                    self._save()
+                    return dict(job)
+        raise KeyError(job_id)
+
+    def cancel(self, job_id):
+        """Drop a job that hasn't started yet; returns False if it's already running or finished"""
+        with self.lock:
+            for job in self.jobs:
+                if job["id"] == job_id and job["status"] == "pending":
+                    job["status"] = "cancelled"
+                    self._save()
+                    return True
+        return False
+
+    def retry_failed(self):
+        with self.lock:
+            count = 0
+            for job in self.jobs:
+                if job["status"] == "failed":
+                    job["status"] = "pending"
+                    count += 1
+            self._save()
+        return count
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs]
+
+    def counts(self):
+        counts = {}
+        for job in self.snapshot():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+
+def resumable_journal(job):
+    """The job's journal if it holds an unfinished run of this same tool, else None"""
+    path = job.get("journal")
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        point = ResumePoint(read_journal(path))
+    except (ValueError, OSError):
+        return None
+    start = point.start
+    if point.finished or (start["tool"], start["flute"], start["layer"]) != (job["tool"], job["flute"], job["layer"]):
+        return None
+    return path
+
+
+def run_job(station, job, cameras, actuator, stepper, progress=None):
+    """Image one tool; returns the fields to store on the job"""
+    start = time.perf_counter()
+    journal = job.get("journal")
+    if resumable_journal(job):
+        # the job was interrupted part way: continue its run instead of starting over
+        image_paths = station.resume_capture_sequence(journal, cameras, actuator, stepper, progress=progress)
+    elif journal:
+        image_paths = station.automated_capture_sequence(
+            job["tool"], job["flute"], job["layer"], cameras, actuator, stepper, progress=progress,
+            journal_path=journal
+        )
+    else:
+        image_paths = station.automated_capture_sequence(
+            job["tool"], job["flute"], job["layer"], cameras, actuator, stepper, progress=progress
+        )
+    return {
+        "seconds": round(time.perf_counter() - start, 2),
+        "images": len(image_paths),
+        "failed_writes": len(cameras.failed_writes),
+        "run_id": cameras.run_id,
+    }
+
+
+def run_queue(queue, station, cameras, actuator, stepper, before_job=None, progress=None, on_finish=None):
+    """Work through every pending job in the queue; a failed tool doesn't stop the others
+
+    before_job(job) runs before each tool (e.g. wait for the operator to load it) and can
+    return False to stop; progress(job, done, total, message) and on_finish(job) report back.
+    """
+    finished = []
+    while True:
+        job = queue.next_pending()
+        if job is None:
+            break
+        if before_job is not None and before_job(job) is False:
+            queue.update(job["id"], status="pending")
+            break
+
+        if hasattr(station, "resume_capture_sequence") and resumable_journal(job) is None:
+            # known before the run starts, so an interrupted job can be resumed; unique because
+            # job ids start over in every queue file
+            job = queue.update(job["id"], journal=os.path.join(station.JOURNAL_DIR, f"job-{uuid.uuid4().hex}.jsonl"))
+
+        job_progress = None
+        if progress is not None:
+            job_progress = lambda done, total, message=None, job=job: progress(job, done, total, message)
+        try:
+            fields = run_job(station, job, cameras, actuator, stepper, job_progress)
+            job = queue.update(job["id"], status="done",
+                               finished=datetime.now().isoformat(timespec="seconds"), **fields)
+        except Exception as e:
+            job = queue.update(job["id"], status="failed", error=str(e),
+                               finished=datetime.now().isoformat(timespec="seconds"))
+        finished.append(job)
+        if on_finish is not None:
+            on_finish(job)
+    return finished
+
+
+def print_report(jobs):
+    done = [job for job in jobs if job["status"] == "done"]
+    print(f"\n{'job':>4}  {'tool':<10} {'flutes':>6} {'layers':>6}  {'status':<9} {'time':>8} {'images':>6}")
+    for job in jobs:
+        seconds = f"{job['seconds']:.1f} s" if "seconds" in job else ""
+        print(f"{job['id']:>4}  {job['tool']:<10} {job['flute']:>6} {job['layer']:>6}  {job['status']:<9} "
+              f"{seconds:>8} {job.get('images', ''):>6}")
+    if done:
+        total = sum(job["seconds"] for job in done)
+        print(f"{len(done)} tools in {total:.1f} s, {total / len(done):.1f} s per tool on average")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image a queue of tools without the Tk interface")
+    parser.add_argument("manifest", nargs="?", help="CSV or JSON manifest of tools to add to the queue")
+    parser.add_argument("--queue", help="job queue file (default: BASE_DIR/batch_queue.json)")
+    parser.add_argument("--script", default="initial", help="initial, pi, or a path to a station script")
+    parser.add_argument("--no-prompt", action="store_true",
+                        help="don't wait for Enter before each tool (e.g. with an automatic loader)")
+    parser.add_argument("--retry-failed", action="store_true", help="queue failed tools again")
+    parser.add_argument("--report", action="store_true", help="only print the queue and its timings")
+    args = parser.parse_args()
+
+    station = load_station(args.script, headless=True)
+    queue = JobQueue(args.queue or os.path.join(station.BASE_DIR, "batch_queue.json"))
+    if args.manifest:
+        added = queue.add(load_manifest(args.manifest))
+        print(f"Queued {len(added)} tools from {args.manifest}")
+    if args.retry_failed:
+        print(f"Queued {queue.retry_failed()} failed tools again")
+    if args.report:
+        print_report(queue.snapshot())
+        return
+
+    counts = queue.counts()
+    if not counts.get("pending"):
+        print(f"Nothing to do ({queue.path})")
+        return
+    print(f"{counts['pending']} tools pending in {queue.path}")
+
+    def before_job(job):
+        if args.no_prompt:
+            return True
+        try:
+            input(f"\nLoad tool {job['tool']} ({job['flute']} flutes, {job['layer']} layers) and press Enter "
+                  f"(Ctrl+C to stop) ")
+        except (KeyboardInterrupt, EOFError):
+            print("\nStopping, the rest of the queue stays pending")
+            return False
+        return True
+
+    def progress(job, done, total, message):
+        print(f"[tool {job['tool']}] {done}/{total} {message or ''}")
+
+    def on_finish(job):
+        if job["status"] == "done":
+            print(f"Tool {job['tool']} done: {job['images']} images in {job['seconds']:.1f} s")
+        else:
+            print(f"Tool {job['tool']} FAILED: {job.get('error')}")
+
+    cameras, actuator, stepper = station.create_hardware()
+    try:
+        finished = run_queue(queue, station, cameras, actuator, stepper, before_job, progress, on_finish)
+    finally:
+        cameras.close()
+        station.GPIO.cleanup()
+    print_report(finished)
+    if any(job["status"] == "failed" for job in finished):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
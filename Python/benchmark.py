@@ -0,0 +1,428 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+import cv2
+import numpy as np
+from station_loader import load_station
+from tracing import tracer
+
+
+class FakeCamera:
+    """Stands in for cv2.VideoCapture: a sensor producing frames at a fixed rate into a small
+    driver buffer, replaying the given frames (or synthetic ones) in a loop
+
+    Like OpenCV's V4L2 backend, it clamps sizes to max_size and applies a width together
+    with the height that follows it, restarting the stream (empty buffer) once per change;
+    restarts counts them.
+    """
+
+    def __init__(self, frames=None, fps=30.0, buffer_size=4, max_size=(1920, 1080)):
+        self.frames = frames
+        self.fps = fps
+        self.buffer_size = buffer_size
+        self.max_size = max_size
+        self.width, self.height = 640, 480
+        self.pending_width = None
+        self.restarts = 0
+        self.opened = True
+        self.start = time.perf_counter()
+        # number of frames taken out of the buffer so far
+        self.consumed = 0
+        self.current = None
+        self.decodes = 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.pending_width = min(int(value), self.max_size[0])
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            width = self.width if self.pending_width is None else self.pending_width
+            self.pending_width = None
+            self._resize(width, min(int(value), self.max_size[1]))
+        elif prop == cv2.CAP_PROP_BUFFERSIZE:
+            self.buffer_size = max(1, int(value))
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = float(value)
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_BUFFERSIZE:
+            return float(self.buffer_size)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def _resize(self, width, height):
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.restarts += 1
+            self.start = time.perf_counter()
+            self.consumed = 0
+            self.current = None
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        if not self.opened:
+            return False
+        period = 1.0 / self.fps
+        produced = int((time.perf_counter() - self.start) / period)
+        # the driver drops the oldest frames once its buffer is full
+        self.consumed = max(self.consumed, produced - self.buffer_size)
+        if self.consumed >= produced:
+            # buffer is empty, wait for the sensor to deliver the next frame
+            next_frame = self.start + (self.consumed + 1) * period
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+        self.consumed += 1
+        self.current = self.consumed
+        return True
+
+    def retrieve(self):
+        if self.current is None:
+            return False, None
+        self.decodes += 1
+        return True, self._frame(self.current).copy()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self.opened = False
+
+    def _frame(self, n):
+        if self.frames:
+            return self.frames[n % len(self.frames)]
+        return synthetic_frames(self.width, self.height)[n % SYNTHETIC_FRAMES]
+
+
+SYNTHETIC_FRAMES = 30
+_synthetic_cache = {}
+
+
+def synthetic_frames(width, height):
+    """A still, textured scene with a bright bar and a little sensor noise per frame"""
+    key = (width, height)
+    if key not in _synthetic_cache:
+        rng = np.random.default_rng(0)
+        scene = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+        cv2.rectangle(scene, (width // 3, height // 4), (width // 3 + width // 8, 3 * height // 4),
+                      (220, 220, 220), -1)
+        frames = []
+        for _ in range(SYNTHETIC_FRAMES):
+            noise = rng.integers(0, 3, scene.shape, dtype=np.uint8)
+            frames.append(cv2.add(scene, noise))
+        _synthetic_cache[key] = frames
+    return _synthetic_cache[key]
+
+
+def load_frames(path, limit=300):
+    """Frames to replay from a video file or a .npy array (one frame or a stack of them)"""
+    if path.endswith(".npy"):
+        array = np.load(path)
+        return [array] if array.ndim == 3 else list(array[:limit])
+
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+class PhaseTimer:
+    """Adds up wall time per phase; a phase called from inside another one counts for the outer one"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.phases = {}
+
+    def wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            if getattr(self.local, "active", False):
+                return fn(*args, **kwargs)
+            self.local.active = True
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.local.active = False
+                with self.lock:
+                    phase = self.phases.setdefault(name, {"count": 0, "seconds": 0.0})
+                    phase["count"] += 1
+                    phase["seconds"] += elapsed
+        return timed
+
+
+class ScaledTime:
+    """Replaces the station script's `time` module: sleeps are scaled and timed as 'sleep'
+
+    Profiled turntable moves schedule themselves in motion_profile and always run in real time.
+    """
+
+    def __init__(self, scale, timer):
+        self.scale = scale
+        self.timed_sleep = timer.wrap("sleep", time.sleep)
+
+    def sleep(self, seconds):
+        self.timed_sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class MoveRecorder:
+    """Remembers every move of one motor: its time window and the delay table it should follow"""
+
+    def __init__(self):
+        self.moves = []
+        # steps run_steps gave up on and restarted its schedule from (profiled moves only)
+        self.rescheduled = 0
+
+    def run_steps(self, run_steps):
+        """Wrap a station's run_steps; the delay table is the one the move is scheduled from"""
+        def recorded(delays, step_fn, *args, **kwargs):
+            delays = list(delays)
+            start = time.perf_counter()
+            stats = run_steps(delays, step_fn, *args, **kwargs)
+            self.moves.append((start, time.perf_counter(), delays))
+            self.rescheduled += stats[1]
+            return stats
+        return recorded
+
+    def move(self, move, delays_for):
+        """Wrap a sleep-paced move method; delays_for(*args) gives the delays it sleeps"""
+        def recorded(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return move(*args, **kwargs)
+            finally:
+                self.moves.append((start, time.perf_counter(), delays_for(*args, **kwargs)))
+        return recorded
+
+
+def motor_timing(gpio, pins, recorder):
+    """Step rate, jitter and missed deadlines of the recorded moves, measured on the simulated pins
+
+    jitter and max_late are the worst of any move; missed_deadlines counts steps that landed
+    more than half a delay after the step before them, rescheduled the ones run_steps gave up on.
+    """
+    reports = [gpio.timing_report(pins, delays, start=start, end=end) for start, end, delays in recorder.moves]
+    reports = [report for report in reports if report["steps"] > 1]
+    if not reports:
+        return None
+    duration = sum(report["duration"] for report in reports)
+    intervals = sum(report["steps"] - 1 for report in reports)
+    return {
+        "moves": len(reports),
+        "steps": sum(report["steps"] for report in reports),
+        "step_rate": intervals / duration if duration else 0.0,
+        "jitter": max(report["jitter"] for report in reports),
+        "max_late": max(report.get("max_late", 0.0) for report in reports),
+        "missed_deadlines": sum(report["missed_deadlines"] for report in reports),
+        "rescheduled": recorder.rescheduled,
+    }
+
+
+def actuator_delays(actuator, sleep_scale):
+    """delays_for of a stepper actuator's move: one (scaled) step_delay sleep after every phase"""
+    def delays_for(degrees, upward=True):
+        if not sleep_scale:
+            # nothing to keep time with, only the step rate is measured
+            return None
+        return [actuator.step_delay * sleep_scale] * actuator.steps_for(degrees)
+    return delays_for
+
+
+def run_benchmark(script="initial", tool="1", flutes=4, layers=2, frames=None, fps=30.0,
+                  sleep_scale=1.0, output_dir=None, trace_path=None):
+    """Run a station's real automated_capture_sequence against fake cameras and simulated GPIO"""
+    keep_output = output_dir is not None
+    output_dir = output_dir or tempfile.mkdtemp(prefix="tool_imaging_bench_")
+    station = load_station(script, gpio="sim", base_dir=output_dir)
+
+    timer = PhaseTimer()
+    station.time = ScaledTime(sleep_scale, timer)
+    # motor moves, checked against the pin transitions afterwards
+    turntable_moves = MoveRecorder()
+    station.run_steps = turntable_moves.run_steps(station.run_steps)
+    cameras, actuator, stepper = station.create_hardware(
+        camera_factory=lambda idx: FakeCamera(frames, fps)
+    )
+    # the Initial station's actuator is a pair of steppers; pi-code's is a timed DC actuator
+    actuator_moves = None
+    if hasattr(actuator, "stepper1_pins"):
+        actuator_moves = MoveRecorder()
+        actuator.move = actuator_moves.move(actuator.move, actuator_delays(actuator, sleep_scale))
+
+    # time every phase of the sequence
+    actuator.extend = timer.wrap("actuator", actuator.extend)
+    actuator.retract = timer.wrap("actuator", actuator.retract)
+    stepper.rotate_degrees = timer.wrap("turntable", stepper.rotate_degrees)
+    if hasattr(stepper, "rotate_steps"):
+        stepper.rotate_steps = timer.wrap("turntable", stepper.rotate_steps)
+    cameras.capture_images = timer.wrap("capture", cameras.capture_images)
+    cameras.flush_writes = timer.wrap("write_flush", cameras.flush_writes)
+    cameras.wait_until_still = timer.wrap("settle", cameras.wait_until_still)
+
+    if trace_path:
+        tracer.start()
+    try:
+        start = time.perf_counter()
+        image_paths = station.automated_capture_sequence(
+            str(tool), str(flutes), str(layers), cameras, actuator, stepper
+        )
+        wall_time = time.perf_counter() - start
+        camera_switches = cameras.pool.switch_report()
+        turntable_timing = motor_timing(station.GPIO, stepper.step_pins, turntable_moves)
+        actuator_timing = None
+        if actuator_moves is not None:
+            actuator_timing = motor_timing(station.GPIO, actuator.stepper1_pins + actuator.stepper2_pins,
+                                           actuator_moves)
+    finally:
+        cameras.close()
+        if trace_path:
+            tracer.stop()
+            tracer.export_chrome(trace_path)
+        if not keep_output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    phases = timer.phases
+    accounted = sum(phase["seconds"] for phase in phases.values())
+    phases["other"] = {"count": 0, "seconds": max(0.0, wall_time - accounted)}
+    return {
+        "script": script,
+        "tool": str(tool),
+        "flutes": flutes,
+        "layers": layers,
+        "sleep_scale": sleep_scale,
+        "camera_fps": fps,
+        "frame_source": "file" if frames else "synthetic",
+        "wall_time": wall_time,
+        "images": len(image_paths),
+        "images_per_sec": len(image_paths) / wall_time if wall_time else 0.0,
+        "phases": phases,
+        "camera_switches": camera_switches,
+        "turntable_timing": turntable_timing,
+        "actuator_timing": actuator_timing,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def compare(result, baseline, tolerance=0.10, min_delta=0.05, jitter_delta=0.0005, missed_delta=0.05):
+    """Phases (and the wall time) that got slower than the baseline by more than tolerance,
+    and motor timing that got worse: lower step rate, more missed deadlines, more jitter
+
+    Returns (name, old, new, unit) tuples.
+    """
+    regressions = []
+    checks = [("wall_time", result["wall_time"], baseline.get("wall_time"))]
+    for name, phase in result["phases"].items():
+        old = baseline.get("phases", {}).get(name)
+        checks.append((name, phase["seconds"], old["seconds"] if old else None))
+
+    for name, new, old in checks:
+        if old is None:
+            continue
+        if new - old > min_delta and new > old * (1 + tolerance):
+            regressions.append((name, old, new, "s"))
+
+    for motor in ("turntable", "actuator"):
+        timing, old_timing = result.get(f"{motor}_timing"), baseline.get(f"{motor}_timing")
+        if not timing or not old_timing:
+            continue
+        if timing["step_rate"] < old_timing["step_rate"] * (1 - tolerance):
+            regressions.append((f"{motor} step rate", old_timing["step_rate"], timing["step_rate"], "steps/s"))
+        # compared as a share of the steps: a few late steps come and go with the OS scheduler
+        missed = timing["missed_deadlines"] / timing["steps"]
+        old_missed = old_timing["missed_deadlines"] / old_timing["steps"]
+        if missed - old_missed > missed_delta and missed > old_missed * (1 + tolerance):
+            regressions.append((f"{motor} missed deadlines", old_missed * 100, missed * 100, "% of steps"))
+        if timing["jitter"] - old_timing["jitter"] > jitter_delta and \
+                timing["jitter"] > old_timing["jitter"] * (1 + tolerance):
+            regressions.append((f"{motor} jitter", old_timing["jitter"] * 1000, timing["jitter"] * 1000, "ms"))
+    return regressions
+
+
+def print_result(result):
+    print(f"\n{result['script']}: {result['flutes']} flutes x {result['layers']} layers "
+          f"(sleep scale {result['sleep_scale']})")
+    print(f"  wall time   {result['wall_time']:8.2f} s")
+    print(f"  images      {result['images']:8d}   ({result['images_per_sec']:.2f} images/s)")
+    for name, phase in sorted(result["phases"].items(), key=lambda item: -item[1]["seconds"]):
+        share = 100 * phase["seconds"] / result["wall_time"] if result["wall_time"] else 0
+        print(f"  {name:<11} {phase['seconds']:8.2f} s  {share:5.1f}%  ({phase['count']} calls)")
+    for motor in ("turntable", "actuator"):
+        timing = result.get(f"{motor}_timing")
+        if timing:
+            rescheduled = f" ({timing['rescheduled']} rescheduled)" if motor == "turntable" else ""
+            print(f"  {motor:<11} {timing['step_rate']:8.1f} steps/s over {timing['moves']} moves, "
+                  f"jitter {timing['jitter'] * 1000:.3f} ms, worst {timing['max_late'] * 1000:.3f} ms late, "
+                  f"{timing['missed_deadlines']} missed deadlines{rescheduled}")
+    for idx, stats in result.get("camera_switches", {}).items():
+        if stats["switches"]:
+            print(f"  camera {idx}    {stats['switches']} stream/still switches, {stats['avg_ms']:.1f} ms avg, "
+                  f"{stats['max_ms']:.1f} ms max ({', '.join(f'{m} {f}' for m, f in stats['formats'].items())})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full capture sequence without the rig")
+    parser.add_argument("--script", default="initial", help="initial, pi, or a path to a station script")
+    parser.add_argument("--tool", default="1")
+    parser.add_argument("--flutes", type=int, default=4)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--frames", help="video file or .npy array to replay instead of synthetic frames")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of the fake cameras")
+    parser.add_argument("--sleep-scale", type=float, default=1.0,
+                        help="multiplier for the script's sleeps (0 skips settle/actuator waits)")
+    parser.add_argument("--output-dir", help="keep the captured images here instead of a temp folder")
+    parser.add_argument("--trace", help="also write a Chrome/Perfetto trace of the run to this file")
+    parser.add_argument("--save", help="write the result as JSON (e.g. a new baseline)")
+    parser.add_argument("--baseline", help="JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown vs the baseline")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames) if args.frames else None
+    result = run_benchmark(args.script, args.tool, args.flutes, args.layers, frames, args.fps,
+                           args.sleep_scale, args.output_dir, args.trace)
+    print_result(result)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved result to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("script", "flutes", "layers", "sleep_scale", "camera_fps"):
+            if baseline.get(key) != result[key]:
+                print(f"WARNING: baseline was run with {key}={baseline.get(key)}, this run used {result[key]}")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION vs {args.baseline}:")
+            for name, old, new, unit in regressions:
+                print(f"  {name}: {old:.2f} {unit} -> {new:.2f} {unit}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
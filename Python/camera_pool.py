@@ -0,0 +1,405 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from sharpness import sharpest
+from tracing import span
+
+
+class CaptureResult(list):
+    """List of saved file paths that also carries how long each camera took (and frame sharpness)"""
+
+    def __init__(self, file_paths=(), timings=None, elapsed=0.0, scores=None):
+        super().__init__(file_paths)
+        # camera index -> seconds spent getting its frame
+        self.timings = timings or {}
+        # camera index -> sharpness of the saved frame (burst captures only)
+        self.scores = scores or {}
+        # wall time of the whole capture (slowest camera when run in parallel)
+        self.elapsed = elapsed
+
+
+STREAM = "stream"
+STILL = "still"
+# asking for more than any camera has makes V4L2 settle on the largest size it supports
+MAX_STILL_SIZE = (10000, 10000)
+
+
+def open_v4l2_camera(idx):
+    return cv2.VideoCapture(idx, cv2.CAP_V4L2)
+
+
+def set_frame_size(camera, width, height):
+    # always both, back to back: OpenCV's V4L2 backend holds a width until the height arrives
+    # and applies the pair as one format change (one stream restart)
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+
+class CameraPool:
+    """Keeps every camera open and streaming so a capture only costs a frame read
+
+    With still_size set, each camera streams at width x height for settling and preview and
+    switches to still_size ((width, height), or "max" for the largest size the driver
+    offers) for the frames that get saved. The first switch_discard frames after a switch
+    are dropped, UVC cameras often deliver a corrupt or badly exposed frame right after one.
+    A camera stays in the mode it was last used in, so only the cameras that do both (the
+    settle camera) switch back and forth. The format the driver negotiates for each mode is
+    cached and set as is on later switches.
+    """
+
+    def __init__(self, camera_indices, width=1280, height=720, fourcc=None,
+                 warmup_time=1.0, warmup_frames=5, buffer_size=2, buffer_sizes=None,
+                 max_failures=3, camera_factory=None, still_size=None, switch_discard=1):
+        self.camera_indices = list(camera_indices)
+        self.width = width
+        self.height = height
+        self.fourcc = fourcc
+        self.warmup_time = warmup_time
+        self.warmup_frames = warmup_frames
+        # driver buffer depth (CAP_PROP_BUFFERSIZE), optionally overridden per camera index;
+        # everything sitting in that buffer is stale by the time a position is captured
+        self.buffer_size = buffer_size
+        self.buffer_sizes = dict(buffer_sizes or {})
+        # consecutive failed reads before a camera gets reopened
+        self.max_failures = max_failures
+        # idx -> VideoCapture-like object (lets benchmarks swap in fake cameras)
+        self.camera_factory = camera_factory or open_v4l2_camera
+
+        self.cameras = {}
+        self.failures = {idx: 0 for idx in self.camera_indices}
+        # camera index -> how many stale frames were flushed and how long it took
+        self.drain_stats = {idx: {"last_flushed": 0, "last_seconds": 0.0, "flushed": 0,
+                                  "seconds": 0.0, "captures": 0}
+                            for idx in self.camera_indices}
+        self.frame_periods = {}
+        self.still_size = still_size
+        self.switch_discard = switch_discard
+        # camera index -> current mode, and mode -> (width, height, frame period) it negotiated
+        self.modes = {}
+        self.formats = {idx: {} for idx in self.camera_indices}
+        self.switch_stats = {idx: {"switches": 0, "seconds": 0.0, "last_seconds": 0.0, "max_seconds": 0.0}
+                             for idx in self.camera_indices}
+        # cameras whose last grab was the first frame after a switch (fresh, no drain needed)
+        self.primed = set()
+        self.locks = {idx: threading.Lock() for idx in self.camera_indices}
+        # one worker per camera so every camera can be read at the same moment
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.camera_indices)),
+                                           thread_name_prefix="camera")
+
+    def open(self):
+        """Open and configure every camera once, then warm them all up together"""
+        for idx in self.camera_indices:
+            self._open_camera(idx)
+
+        # one shared warmup instead of one per camera per capture
+        if self.cameras:
+            time.sleep(self.warmup_time)
+            for idx in list(self.cameras):
+                self._warmup(idx)
+
+        if len(self.cameras) != len(self.camera_indices):
+            print("WARNING: Not all cameras were initialized!")
+        return list(self.cameras)
+
+    def _open_camera(self, idx):
+        try:
+            camera = self.camera_factory(idx)
+            if self.fourcc:
+                camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+            set_frame_size(camera, self.width, self.height)
+            camera.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+            camera.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_sizes.get(idx, self.buffer_size))
+
+            if camera.isOpened():
+                # keep what the driver actually accepted, not what we asked for
+                actual = int(camera.get(cv2.CAP_PROP_BUFFERSIZE) or 0)
+                if actual > 0:
+                    self.buffer_sizes[idx] = actual
+                fps = camera.get(cv2.CAP_PROP_FPS) or 30.0
+                self.frame_periods[idx] = 1.0 / fps
+                self.modes[idx] = STREAM
+                self.formats[idx][STREAM] = (int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                             int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)), 1.0 / fps)
+                self.primed.discard(idx)
+                self.cameras[idx] = camera
+                self.failures[idx] = 0
+                print(f"Camera {idx} initialized successfully")
+                return True
+
+            camera.release()
+            print(f"Failed to open camera {idx}")
+        except Exception as e:
+            print(f"Error initializing camera {idx}: {e}")
+        return False
+
+    def _warmup(self, idx):
+        camera = self.cameras[idx]
+        for _ in range(self.warmup_frames):
+            camera.grab()
+
+    def reopen(self, idx):
+        """Release and reopen a single camera (used when it stops delivering frames)"""
+        camera = self.cameras.pop(idx, None)
+        if camera is not None:
+            camera.release()
+        print(f"Reopening camera {idx}...")
+        if self._open_camera(idx):
+            time.sleep(self.warmup_time)
+            self._warmup(idx)
+            return True
+        return False
+
+    def _switch(self, idx, mode):
+        """Put camera idx in STREAM or STILL mode (caller holds its lock)
+
+        Returns the seconds the switch took, up to the first usable frame in the new format,
+        or None if there was nothing to switch.
+        """
+        camera = self.cameras.get(idx)
+        if self.still_size is None or camera is None or self.modes.get(idx) == mode:
+            return None
+        cached = self.formats[idx].get(mode)
+        if cached is not None:
+            width, height = cached[:2]
+        elif mode == STILL:
+            width, height = MAX_STILL_SIZE if self.still_size == "max" else self.still_size
+        else:
+            width, height = self.width, self.height
+
+        start = time.perf_counter()
+        with span("camera.switch", camera=idx, mode=mode):
+            set_frame_size(camera, width, height)
+            negotiated = cached is None
+            if negotiated:
+                fps = camera.get(cv2.CAP_PROP_FPS) or 30.0
+                cached = (int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)), int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                          1.0 / fps)
+                self.formats[idx][mode] = cached
+            # the driver restarts the stream in the new format; the frames right after the
+            # restart are dropped and the next one ends the switch
+            for _ in range(self.switch_discard + 1):
+                ok = camera.grab()
+                if not ok:
+                    break
+        seconds = time.perf_counter() - start
+
+        self.modes[idx] = mode
+        self.frame_periods[idx] = cached[2]
+        if ok:
+            self.primed.add(idx)
+        stats = self.switch_stats[idx]
+        stats["switches"] += 1
+        stats["seconds"] += seconds
+        stats["last_seconds"] = seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if negotiated:
+            print(f"Camera {idx} {mode} format: {cached[0]}x{cached[1]} at {1 / cached[2]:.0f} fps")
+        return seconds
+
+    def switch_report(self):
+        """Per camera: how often it switched between stream and stills and how long that took"""
+        report = {}
+        for idx, stats in self.switch_stats.items():
+            switches = stats["switches"] or 1
+            report[idx] = {
+                "switches": stats["switches"],
+                "last_ms": stats["last_seconds"] * 1000,
+                "avg_ms": stats["seconds"] * 1000 / switches,
+                "max_ms": stats["max_seconds"] * 1000,
+                "formats": {mode: f"{width}x{height}" for mode, (width, height, _) in self.formats[idx].items()},
+            }
+        return report
+
+    def is_healthy(self, idx):
+        camera = self.cameras.get(idx)
+        return camera is not None and camera.isOpened() and self.failures[idx] == 0
+
+    def check_health(self):
+        """Read one frame from every camera, reopen the ones that fail; returns {idx: ok}"""
+        status = {}
+        for idx in self.camera_indices:
+            with self.locks[idx]:
+                camera = self.cameras.get(idx)
+                ok = camera is not None and camera.isOpened() and camera.grab()
+                if not ok:
+                    ok = self.reopen(idx)
+                self.failures[idx] = 0 if ok else self.failures[idx] + 1
+                status[idx] = ok
+        return status
+
+    def drain(self, idx, record=True):
+        """Throw away the stale frames sitting in the driver buffer without decoding them
+
+        grab() only dequeues the buffer, so a stale MJPG frame costs no decode. A grab that
+        has to wait most of a frame period was served by the sensor rather than the
+        buffer, which means the buffer is empty and that frame is already fresh.
+        Returns (got_fresh_frame, frames_flushed, seconds).
+        """
+        camera = self.cameras[idx]
+        self.primed.discard(idx)
+        buffer_size = self.buffer_sizes.get(idx, self.buffer_size)
+        fresh_after = self.frame_periods.get(idx, 1 / 30) * 0.5
+
+        start = time.perf_counter()
+        flushed = 0
+        fresh = False
+        for _ in range(buffer_size):
+            grab_start = time.perf_counter()
+            if not camera.grab():
+                break
+            if time.perf_counter() - grab_start >= fresh_after:
+                fresh = True
+                break
+            flushed += 1
+        else:
+            # buffer emptied, this grab waits for a frame exposed after the flush
+            fresh = camera.grab()
+        seconds = time.perf_counter() - start
+        if not record:
+            return fresh, flushed, seconds
+
+        stats = self.drain_stats[idx]
+        stats["last_flushed"] = flushed
+        stats["last_seconds"] = seconds
+        stats["flushed"] += flushed
+        stats["seconds"] += seconds
+        stats["captures"] += 1
+        return fresh, flushed, seconds
+
+    def freshness_report(self):
+        """Per camera: stale frames flushed and time spent flushing (last capture and average)"""
+        report = {}
+        for idx, stats in self.drain_stats.items():
+            captures = stats["captures"] or 1
+            report[idx] = {
+                "buffer_size": self.buffer_sizes.get(idx, self.buffer_size),
+                "last_flushed": stats["last_flushed"],
+                "last_ms": stats["last_seconds"] * 1000,
+                "avg_flushed": stats["flushed"] / captures,
+                "avg_ms": stats["seconds"] * 1000 / captures,
+                "captures": stats["captures"],
+            }
+        return report
+
+    def read(self, idx):
+        """Return (ret, frame) with a fresh frame from camera idx, decoding only that frame"""
+        with self.locks[idx]:
+            camera = self.cameras.get(idx)
+            if camera is None and not self.reopen(idx):
+                return False, None
+            camera = self.cameras[idx]
+
+            ret, frame = False, None
+            if idx in self.primed:
+                # the frame a switch just grabbed is as fresh as it gets
+                self.primed.discard(idx)
+                fresh = True
+            else:
+                with span("camera.drain", camera=idx):
+                    fresh = self.drain(idx)[0]
+            if fresh:
+                with span("camera.decode", camera=idx):
+                    ret, frame = camera.retrieve()
+
+            if ret:
+                self.failures[idx] = 0
+            else:
+                self.failures[idx] += 1
+                if self.failures[idx] >= self.max_failures:
+                    self.reopen(idx)
+            return ret, frame
+
+    def flush(self, idx, mode=None):
+        """Drop whatever is sitting in the driver buffer (not counted in the freshness stats)
+
+        With a mode, the camera is switched to it first; a switch restarts the stream, which
+        leaves nothing stale to drop.
+        """
+        with self.locks[idx]:
+            if idx in self.cameras and (mode is None or self._switch(idx, mode) is None):
+                self.drain(idx, record=False)
+
+    def read_next(self, idx):
+        """Next frame off the stream without flushing first, for watching it continuously"""
+        with self.locks[idx]:
+            camera = self.cameras.get(idx)
+            if camera is None:
+                return False, None
+            self.primed.discard(idx)
+            return camera.read()
+
+    def read_stream(self, idx):
+        """Next low-res stream frame (for settling and preview), switching back from stills if needed"""
+        with self.locks[idx]:
+            self._switch(idx, STREAM)
+        return self.read_next(idx)
+
+    def read_sharpest(self, idx, burst, method="laplacian", floor=0.0, retakes=0):
+        """Read a burst of fresh frames and keep the sharpest one; returns (ret, frame, score)
+
+        If even the sharpest frame scores below floor (motion blur), the burst is taken
+        again, up to retakes times, and the best frame seen over all bursts is kept.
+        """
+        best_frame, best_score = None, None
+        for attempt in range(retakes + 1):
+            ret, frame = self.read(idx)
+            if not ret:
+                break
+            frames = [frame]
+            for _ in range(burst - 1):
+                ret, frame = self.read_next(idx)
+                if ret:
+                    frames.append(frame)
+
+            with span("camera.sharpness", camera=idx, frames=len(frames)):
+                best, score = sharpest(frames, method)
+            if best_score is None or score > best_score:
+                best_frame, best_score = frames[best], score
+            if best_score >= floor:
+                break
+            if attempt < retakes:
+                print(f"Camera {idx}: sharpest frame scored {best_score:.1f} (floor {floor}), retaking")
+        return best_frame is not None, best_frame, best_score
+
+    def _timed_read(self, idx, burst=0, method="laplacian", floor=0.0, retakes=0):
+        start = time.perf_counter()
+        score = None
+        # saved frames come from the still format
+        with self.locks[idx]:
+            self._switch(idx, STILL)
+        with span("camera.read", camera=idx):
+            if burst > 1:
+                ret, frame, score = self.read_sharpest(idx, burst, method, floor, retakes)
+            else:
+                ret, frame = self.read(idx)
+        return ret, frame, time.perf_counter() - start, score
+
+    def read_many(self, indices, parallel=True, burst=0, method="laplacian", floor=0.0, retakes=0):
+        """Read a frame from every camera in indices; returns {idx: (ret, frame, seconds, score)}
+
+        In parallel mode each camera is read by its own worker, so the call takes as
+        long as the slowest camera rather than the sum of all of them. With burst > 1 every
+        camera keeps the sharpest of `burst` frames (see read_sharpest) and score is its
+        sharpness; otherwise score is None.
+        """
+        options = {"burst": burst, "method": method, "floor": floor, "retakes": retakes}
+        if not parallel or len(indices) < 2:
+            return {idx: self._timed_read(idx, **options) for idx in indices}
+
+        futures = {idx: self.executor.submit(self._timed_read, idx, **options) for idx in indices}
+        results = {}
+        for idx, future in futures.items():
+            try:
+                results[idx] = future.result()
+            except Exception as e:
+                print(f"Error reading camera {idx}: {e}")
+                results[idx] = (False, None, 0.0, None)
+        return results
+
+    def close(self):
+        """Release all cameras"""
+        self.executor.shutdown(wait=True)
+        for camera in self.cameras.values():
+            camera.release()
+        self.cameras.clear()
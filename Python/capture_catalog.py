@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+
+COLUMNS = ["run_id", "tool", "flute", "layer", "height", "angle", "camera", "position",
+           "timestamp", "path", "sharpness"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    tool TEXT NOT NULL,
+    flute TEXT,
+    layer TEXT,
+    height REAL,
+    angle REAL,
+    camera INTEGER,
+    position TEXT,
+    timestamp TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sharpness REAL
+);
+CREATE INDEX IF NOT EXISTS captures_tool ON captures (tool, layer, position, angle);
+CREATE INDEX IF NOT EXISTS captures_run ON captures (run_id);
+CREATE INDEX IF NOT EXISTS captures_path ON captures (path);
+"""
+
+
+def new_run_id():
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class CaptureCatalog:
+    """SQLite index of every saved image: which tool, flute, layer, height, angle and camera
+    it shows, when it was taken, where it is and how sharp it was
+
+    add() only buffers the row; rows are inserted batch_size at a time in one transaction
+    (and on commit()/close()), so cataloguing doesn't add an SD card sync per image.
+    """
+
+    def __init__(self, path, batch_size=64):
+        self.path = path
+        self.batch_size = batch_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets the query CLI read while a run is writing
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.pending = []
+
+    def add(self, tool, path, flute=None, layer=None, height=None, angle=None, camera=None,
+            position=None, sharpness=None, run_id=None, timestamp=None):
+        row = {
+            "run_id": run_id, "tool": str(tool), "flute": None if flute is None else str(flute),
+            "layer": None if layer is None else str(layer), "height": height, "angle": angle,
+            "camera": camera, "position": position,
+            "timestamp": timestamp or datetime.now().isoformat(timespec="milliseconds"),
+            "path": path, "sharpness": sharpness,
+        }
+        with self.lock:
+            self.pending.append(tuple(row[column] for column in COLUMNS))
+            if len(self.pending) >= self.batch_size:
+                self._commit()
+
+    def _commit(self):
+        if not self.pending:
+            return
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                self.pending
+            )
+        self.pending = []
+
+    def commit(self):
+        """Insert every buffered row"""
+        with self.lock:
+            self._commit()
+
+    def remove(self, paths):
+        """Drop the rows of images that never made it to disk"""
+        with self.lock:
+            self._commit()
+            with self.connection:
+                self.connection.executemany("DELETE FROM captures WHERE path = ?", [(path,) for path in paths])
+
+    def query(self, tool=None, flute=None, layer=None, position=None, camera=None, angle=None,
+              run_id=None, min_sharpness=None, limit=None):
+        """Rows (as dicts) matching every given field, in capture order"""
+        clauses, values = [], []
+        for column, value in (("tool", tool), ("flute", flute), ("layer", layer), ("position", position),
+                              ("camera", camera), ("angle", angle), ("run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                values.append(str(value) if column in ("tool", "flute", "layer") else value)
+        if min_sharpness is not None:
+            clauses.append("sharpness >= ?")
+            values.append(min_sharpness)
+        sql = "SELECT * FROM captures"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self.lock:
+            self._commit()
+            return [dict(row) for row in self.connection.execute(sql, values)]
+
+    def runs(self, tool=None):
+        """One summary per run: id, tool, image count, first and last capture time"""
+        sql = ("SELECT run_id, tool, COUNT(*) AS images, MIN(timestamp) AS started, MAX(timestamp) AS finished "
+               "FROM captures")
+        values = []
+        if tool is not None:
+            sql += " WHERE tool = ?"
+            values.append(str(tool))
+        sql += " GROUP BY run_id, tool ORDER BY started"
+        with self.lock:
+            self._commit()
+            return [dict(row) for row in self.connection.execute(sql, values)]
+
+    def close(self):
+        with self.lock:
+            self._commit()
+            self.connection.close()
+
+
+# the two filename layouts the stations have used, for cataloguing images taken before the catalog existed
+_INITIAL_NAME = re.compile(r"T(?P<tool>[^_]+)_FL(?P<flute>[^_]+)_OD(?P<layer>[^_/\\]+)[/\\]"
+                           r"(?P<date>[\d-]+)_L(?P<height>[-\d.]+)_(?P<position>[^_]+)_(?P<angle>[-\d.]+)deg\.jpg$")
+_PI_NAME = re.compile(r"T(?P<tool>[^_]+)_FL(?P<flute>[^_]+)_OD(?P<layer>[^_]+)_(?P<position>[^_]+)_"
+                      r"(?P<angle>[-\d.]+)deg\.jpg$")
+
+
+def parse_image_path(path):
+    """Catalog fields encoded in an image's path, or None if it doesn't follow either layout"""
+    match = _INITIAL_NAME.search(path) or _PI_NAME.search(path)
+    if not match:
+        return None
+    fields = match.groupdict()
+    fields.pop("date", None)
+    fields["angle"] = float(fields["angle"])
+    if "height" in fields:
+        fields["height"] = float(fields["height"])
+    return fields
+
+
+def import_tree(catalog, base_dir, run_id="imported"):
+    """Catalog every existing image under base_dir whose name can be parsed"""
+    known = {row["path"] for row in catalog.query()}
+    count = 0
+    for root, _, files in os.walk(base_dir):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            fields = parse_image_path(path)
+            if fields is None or path in known:
+                continue
+            timestamp = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="milliseconds")
+            catalog.add(path=path, run_id=run_id, timestamp=timestamp, **fields)
+            count += 1
+    catalog.commit()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the capture catalog")
+    parser.add_argument("catalog", help="path of the catalog database (BASE_DIR/catalog.sqlite)")
+    parser.add_argument("--tool")
+    parser.add_argument("--flute")
+    parser.add_argument("--layer")
+    parser.add_argument("--position", help="camera position, e.g. top, side1")
+    parser.add_argument("--camera", type=int)
+    parser.add_argument("--angle", type=float)
+    parser.add_argument("--run")
+    parser.add_argument("--min-sharpness", type=float)
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--runs", action="store_true", help="list runs instead of images")
+    parser.add_argument("--import-dir", help="first catalog existing images under this folder")
+    args = parser.parse_args()
+
+    catalog = CaptureCatalog(args.catalog)
+    try:
+        if args.import_dir:
+            print(f"Imported {import_tree(catalog, args.import_dir)} images")
+
+        start = time.perf_counter()
+        if args.runs:
+            rows = catalog.runs(args.tool)
+            elapsed = time.perf_counter() - start
+            for row in rows:
+                print(f"{row['run_id']}  T{row['tool']}  {row['images']:5d} images  {row['started']} -> {row['finished']}")
+        else:
+            rows = catalog.query(args.tool, args.flute, args.layer, args.position, args.camera,
+                                 args.angle, args.run, args.min_sharpness, args.limit)
+            elapsed = time.perf_counter() - start
+            for row in rows:
+                print(row["path"])
+        print(f"{len(rows)} rows in {elapsed * 1000:.1f} ms")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import tempfile
+from station_loader import load_station
+
+
+class PlanStep:
+    """One thing the station does during a run
+
+    kind is "settle" (seconds), "extend"/"retract" (degrees), "move_to" (degrees from the
+    top), "home" (back to the top), "rotate" (increments, clockwise) or "capture" (height,
+    position, camera_num). label is shown as progress after captures.
+    """
+
+    def __init__(self, kind, label=None, **args):
+        self.kind = kind
+        self.label = label
+        self.args = args
+
+    def __repr__(self):
+        args = ", ".join(f"{key}={value!r}" for key, value in self.args.items())
+        return f"{self.kind}({args})"
+
+
+def compile_plan(flute_number, layer_number, alternate=True):
+    """Steps of the Initial station's layer/flute sequence
+
+    The side cameras visit flute_number turntable positions per layer. Without alternate
+    this is the original order: rotate after every capture (including the last), then turn
+    all the way back before the next layer. With alternate, odd layers visit the positions
+    in reverse, so the turntable never rewinds between layers and the rotation after the last
+    capture of a layer is skipped; the positions and their angles are the same.
+    """
+    flutes, layers = int(flute_number), int(layer_number)
+    angle_step = 180 / flutes
+    plan = [
+        PlanStep("settle", seconds=0.5),
+        PlanStep("move_to", degrees=900),
+        # initial positioning by starting with tool fully down
+        PlanStep("capture", "Captured top view", height=0, position=0, camera_num=0),
+        PlanStep("settle", seconds=0.5),
+    ]
+
+    # turntable position in increments from where the run started
+    index = 0
+    for layer in range(layers):
+        plan.append(PlanStep("retract", degrees=200 / layers))
+        reverse = alternate and layer % 2 == 1
+        order = range(flutes - 1, -1, -1) if reverse else range(flutes)
+        for n, position in enumerate(order):
+            if alternate and n > 0:
+                # move to this position from the previous one
+                plan.append(PlanStep("rotate", increments=1, clockwise=not reverse))
+                plan.append(PlanStep("settle", seconds=0.3))
+                index += -1 if reverse else 1
+            # both side cameras are read at the same time
+            angles = {1: (position + 1) * angle_step, 2: 180 + (position + 1) * angle_step}
+            plan.append(PlanStep("capture", f"Layer {layer + 1}/{layers}, position {n + 1}/{flutes}",
+                                 height=layer, position=angles, camera_num=[1, 2]))
+            if not alternate:
+                plan.append(PlanStep("rotate", increments=1, clockwise=True))
+                plan.append(PlanStep("settle", seconds=0.3))
+                index += 1
+        if not alternate:
+            # reverse rotation, one increment at a time like the original sequence
+            for _ in range(index):
+                plan.append(PlanStep("rotate", increments=1, clockwise=False))
+            index = 0
+
+    if index:
+        # back to the start in one move
+        plan.append(PlanStep("rotate", increments=index, clockwise=False))
+    plan.append(PlanStep("settle", seconds=0.5))
+    plan.append(PlanStep("home"))
+    return plan
+
+
+def count_captures(plan):
+    return sum(1 for step in plan if step.kind == "capture")
+
+
+def _height(actuator, tracked):
+    # the saved axis position when there is one, it doesn't accumulate rounding
+    position = actuator.position()
+    return tracked if position is None else position
+
+
+def _move_to(actuator, cam_height, target):
+    """Move to target degrees from the top; returns the new height"""
+    if actuator.position() is not None:
+        actuator.move_to(target)
+        return actuator.position()
+    # unknown height: relative to the height tracked since the start of the run
+    if target > cam_height:
+        return cam_height + actuator.extend(target - cam_height)
+    if target < cam_height:
+        return cam_height - actuator.retract(cam_height - target)
+    return cam_height
+
+
+def run_plan(plan, tool_number, flute_number, layer_number, cameras, actuator, stepper, settle,
+             angle_increment, progress=None, journal=None, resume=None):
+    """Execute a plan on the hardware; returns the captured file paths
+
+    settle(seconds, cameras) is the station's settle function and angle_increment the
+    turntable angle of one rotate increment. Every completed step is written to journal
+    (a run_journal.RunJournal). resume (a run_journal.ResumePoint) skips the steps an
+    interrupted run already did, after moving the axes back to where that run left off.
+    """
+    increment_steps = stepper.steps_for(angle_increment)
+    total = count_captures(plan)
+    done = 0
+    # without a saved height the cameras are at the top, aligned by hand
+    cam_height = _height(actuator, 0)
+    # turntable position in increments from the start of the run
+    turntable = 0
+    first = 0
+    file_paths = []
+
+    if resume is not None:
+        cam_height, turntable = _height(actuator, resume.cam_height), resume.turntable
+        # the saved turntable position also covers a move the journal didn't get to record
+        origin, current = resume.start.get("turntable_origin"), stepper.position_steps()
+        if origin is not None and current is not None:
+            turntable = int(round((current - origin) / increment_steps))
+        first = resume.index
+        done = count_captures(plan[:first])
+        # axes may be past the resume point if its images never reached the disk
+        offset = resume.target_turntable - turntable
+        if offset:
+            stepper.rotate_steps(abs(offset) * increment_steps, offset > 0)
+            turntable += offset
+        cam_height = _move_to(actuator, cam_height, resume.target_height)
+        settle(0.5, cameras)
+
+    for index in range(first, len(plan)):
+        step = plan[index]
+        args = step.args
+        step_files = []
+        if step.kind == "settle":
+            settle(args["seconds"], cameras)
+        elif step.kind == "extend":
+            cam_height = _height(actuator, cam_height + actuator.extend(args["degrees"]))
+        elif step.kind == "retract":
+            cam_height = _height(actuator, cam_height - actuator.retract(args["degrees"]))
+        elif step.kind == "move_to":
+            cam_height = _move_to(actuator, cam_height, args["degrees"])
+        elif step.kind == "home":
+            cam_height = _move_to(actuator, cam_height, 0)
+        elif step.kind == "rotate":
+            # whole increments in steps, so a combined move lands exactly where single ones would
+            stepper.rotate_steps(args["increments"] * increment_steps, args["clockwise"])
+            turntable += args["increments"] if args["clockwise"] else -args["increments"]
+        elif step.kind == "capture":
+            step_files = cameras.capture_images(tool_number, flute_number, layer_number, args["height"],
+                                                args["position"], args["camera_num"])
+            file_paths.extend(step_files)
+            done += 1
+            if progress:
+                progress(done, total, step.label)
+        else:
+            raise ValueError(f"Unknown plan step: {step.kind}")
+        if journal is not None:
+            journal.step(index, step.kind, round(cam_height, 3), turntable, step_files)
+    return file_paths
+
+
+def estimate_plan(plan, actuator, stepper, angle_increment, capture_time=0.2):
+    """(total seconds, seconds per step kind) the plan should take
+
+    Settles count at their full timeout (adaptive settling can only be faster) and every
+    capture at capture_time. Vertical moves are estimated from a run starting at the top.
+    """
+    increment_steps = stepper.steps_for(angle_increment)
+    by_kind = {}
+    height = 0.0
+    for step in plan:
+        args = step.args
+        if step.kind == "settle":
+            seconds = args["seconds"]
+        elif step.kind == "extend":
+            seconds = actuator.move_time(args["degrees"])
+            height += args["degrees"]
+        elif step.kind == "retract":
+            seconds = actuator.move_time(args["degrees"])
+            height -= args["degrees"]
+        elif step.kind == "move_to":
+            seconds = actuator.move_time(abs(args["degrees"] - height))
+            height = args["degrees"]
+        elif step.kind == "home":
+            seconds = actuator.move_time(max(0.0, height))
+            height = 0.0
+        elif step.kind == "rotate":
+            seconds = stepper.move_time(args["increments"] * increment_steps)
+        else:
+            seconds = capture_time
+        by_kind[step.kind] = by_kind.get(step.kind, 0.0) + seconds
+    return sum(by_kind.values()), by_kind
+
+
+def print_plan(plan, estimate=None):
+    for i, step in enumerate(plan):
+        print(f"{i + 1:4d}  {step!r}")
+    if estimate is not None:
+        total, by_kind = estimate
+        minutes, seconds = divmod(total, 60)
+        print(f"\nEstimated {int(minutes)} min {seconds:.1f} s")
+        for kind, seconds in sorted(by_kind.items(), key=lambda item: -item[1]):
+            print(f"  {kind:<8} {seconds:7.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a tool's capture plan and how long it should take")
+    parser.add_argument("--flutes", type=int, required=True)
+    parser.add_argument("--layers", type=int, required=True)
+    parser.add_argument("--no-alternate", action="store_true", help="plan with the original rewind between layers")
+    parser.add_argument("--capture-time", type=float, default=0.2, help="seconds per capture")
+    parser.add_argument("--steps", action="store_true", help="also list every step")
+    args = parser.parse_args()
+
+    # only the motion controllers are built: no cameras, no GPIO, nothing written
+    station = load_station("initial", gpio="sim", base_dir=tempfile.gettempdir(), headless=True)
+    actuator, stepper = station.create_motion()
+    angle_increment = 95 / args.flutes
+
+    alternate = not args.no_alternate
+    plan = compile_plan(args.flutes, args.layers, alternate)
+    estimate = estimate_plan(plan, actuator, stepper, angle_increment, args.capture_time)
+    print_plan(plan if args.steps else [], estimate)
+    print(f"{count_captures(plan)} captures, {sum(1 for step in plan if step.kind == 'rotate')} turntable moves")
+    if alternate:
+        rewind = estimate_plan(compile_plan(args.flutes, args.layers, False), actuator, stepper,
+                               angle_increment, args.capture_time)
+        print(f"\nRewinding between layers instead would take {rewind[0]:.1f} s "
+              f"({rewind[0] - estimate[0]:.1f} s more)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import json
+import hashlib
+import argparse
+import threading
+import cv2
+from edge_overlay import EdgeOverlayProcessor
+
+
+_local = threading.local()
+
+
+def _processor(mode, threshold1, threshold2, roi, **options):
+    # overlay processors keep their buffers between calls, so each thread gets its own
+    processors = getattr(_local, "processors", None)
+    if processors is None:
+        processors = _local.processors = {}
+    key = (mode, threshold1, threshold2, tuple(roi) if roi else None)
+    processor = processors.get(key)
+    if processor is None:
+        processor = processors[key] = EdgeOverlayProcessor(threshold1, threshold2, mode=mode,
+                                                           roi=roi, **options)
+    return processor
+
+
+def edges(frame, threshold1=100, threshold2=200, roi=None):
+    """pi-code.py's saved overlay: frame blended with its Canny edges"""
+    return _processor("blend", threshold1, threshold2, roi).process(frame)
+
+
+def edges_red(frame, threshold1=100, threshold2=200, roi=None):
+    """Live-view style overlay: dimmed frame with the edges painted red"""
+    return _processor("color", threshold1, threshold2, roi, alpha=0.8).process(frame)
+
+
+# name -> function(frame, **params) returning the derived frame
+DERIVATIVES = {
+    "edges": edges,
+    "edges_red": edges_red,
+}
+
+
+class DerivedImageCache:
+    """Images computed from raw captures on first request and kept on disk for the next one
+
+    A derived image is identified by its source file (path, size and modification time, so
+    a re-captured image is never served a stale overlay), the derivative name and its
+    parameters. The cache stays under max_bytes by deleting the least recently used files.
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, jpeg_quality=95):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self.lock = threading.Lock()
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_path, name, params):
+        stat = os.stat(source_path)
+        identity = {
+            "source": os.path.abspath(source_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "name": name,
+            "params": params,
+        }
+        return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def get(self, source_path, name="edges", **params):
+        """Path of the derived image, computing and caching it if needed"""
+        if name not in DERIVATIVES:
+            raise ValueError(f"Unknown derivative: {name}")
+        path = self.path_for(self.key(source_path, name, params))
+        if os.path.exists(path):
+            # touch it so eviction sees it as recently used
+            os.utime(path)
+            with self.lock:
+                self.hits += 1
+            return path
+
+        frame = cv2.imread(source_path)
+        if frame is None:
+            raise ValueError(f"Could not read {source_path}")
+        derived = DERIVATIVES[name](frame, **params)
+        ok, data = cv2.imencode(".jpg", derived, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError(f"Could not encode {name} for {source_path}")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # temp name first so a concurrent reader never sees half a file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data.tobytes())
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.misses += 1
+            if self.size is None:
+                self.size = self._scan_size()
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def load(self, source_path, name="edges", **params):
+        """The derived image itself (decoded)"""
+        return cv2.imread(self.get(source_path, name, **params))
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".jpg"):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, keep=None):
+        # oldest first until the cache fits again
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "files": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        with self.lock:
+            for _, _, path in self._entries():
+                os.remove(path)
+            self.size = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute (or fetch cached) derived images for raw captures")
+    parser.add_argument("images", nargs="*", help="raw captured images")
+    parser.add_argument("--name", default="edges", choices=sorted(DERIVATIVES))
+    parser.add_argument("--threshold1", type=int, default=100)
+    parser.add_argument("--threshold2", type=int, default=200)
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "W", "H"))
+    parser.add_argument("--cache-dir", required=True, help="where derived images are kept")
+    parser.add_argument("--max-mb", type=float, default=512, help="cache size limit in MB")
+    parser.add_argument("--stats", action="store_true", help="print cache usage")
+    parser.add_argument("--clear", action="store_true", help="delete every cached image")
+    args = parser.parse_args()
+
+    cache = DerivedImageCache(args.cache_dir, int(args.max_mb * 1024 * 1024))
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.cache_dir}")
+
+    params = {"threshold1": args.threshold1, "threshold2": args.threshold2}
+    if args.roi:
+        params["roi"] = args.roi
+    for image in args.images:
+        try:
+            print(f"{image} -> {cache.get(image, args.name, **params)}")
+        except Exception as e:
+            print(f"{image}: {e}")
+
+    if args.stats:
+        stats = cache.stats()
+        print(f"{stats['files']} files, {stats['bytes'] / 1e6:.1f} MB of {stats['max_bytes'] / 1e6:.1f} MB "
+              f"({stats['hits']} hits, {stats['misses']} misses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import time
+import argparse
+import cv2
+import numpy as np
+
+
+class EdgeOverlayProcessor:
+    """Canny edge overlay that reuses the same buffers for every frame of a given size
+
+    "blend" mode is pi-code.py's saved image (frame * 0.7 + edges * 0.3), "color" mode is
+    the live view from Edge Detection Python Code.py (frame * 0.8 with edges painted in
+    edge_color). roi = (x, y, w, h) limits edge detection to that part of the frame; the
+    rest of the frame is passed through unchanged. One processor per thread: the buffers
+    are shared between calls.
+    """
+
+    def __init__(self, threshold1=100, threshold2=200, mode="blend", alpha=0.7, beta=0.3,
+                 edge_color=(0, 0, 255), roi=None):
+        if mode not in ("blend", "color"):
+            raise ValueError(f"Unknown overlay mode: {mode}")
+        self.threshold1 = threshold1
+        self.threshold2 = threshold2
+        self.mode = mode
+        self.alpha = alpha
+        self.beta = beta
+        self.edge_color = tuple(edge_color) + (0,)
+        self.roi = roi
+        self.buffers = {}
+
+    def _buffers(self, shape):
+        # one set of buffers per frame size
+        buffers = self.buffers.get(shape)
+        if buffers is None:
+            height, width = shape[:2]
+            buffers = {
+                "gray": np.empty((height, width), np.uint8),
+                "edges": np.empty((height, width), np.uint8),
+                "edges_bgr": np.empty((height, width, 3), np.uint8),
+                "out": np.empty((height, width, 3), np.uint8),
+            }
+            self.buffers[shape] = buffers
+        return buffers
+
+    def process(self, frame, out=None):
+        """Overlay for frame; written into out (or an internal buffer that the next call reuses)"""
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            if out is None:
+                out = self._buffers(frame.shape)["out"]
+            if out is not frame:
+                np.copyto(out, frame)
+            # views into the full frame, so nothing outside the roi is touched
+            self._overlay(frame[y:y + h, x:x + w], out[y:y + h, x:x + w])
+            return out
+
+        buffers = self._buffers(frame.shape)
+        if out is None:
+            out = buffers["out"]
+        self._overlay(frame, out, buffers)
+        return out
+
+    def _overlay(self, frame, out, buffers=None):
+        if buffers is None:
+            # roi views aren't contiguous, so they get their own (roi-sized) buffers
+            buffers = self._buffers(frame.shape)
+        gray, edges = buffers["gray"], buffers["edges"]
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        cv2.Canny(gray, self.threshold1, self.threshold2, edges=edges)
+
+        if self.mode == "blend":
+            edges_bgr = buffers["edges_bgr"]
+            cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR, dst=edges_bgr)
+            cv2.addWeighted(frame, self.alpha, edges_bgr, self.beta, 0, dst=out)
+        else:
+            # dim the frame, then paint only the edge pixels (edges doubles as the mask)
+            cv2.convertScaleAbs(frame, dst=out, alpha=self.alpha)
+            cv2.add(out, self.edge_color, dst=out, mask=edges)
+        return out
+
+
+def benchmark(frames, iterations=200, **options):
+    """Frames per second for the live (color) and saved (blend) overlays on this CPU"""
+    results = {}
+    for mode in ("color", "blend"):
+        processor = EdgeOverlayProcessor(mode=mode, **options)
+        # first call allocates the buffers, leave it out of the timing
+        processor.process(frames[0])
+        start = time.perf_counter()
+        for i in range(iterations):
+            processor.process(frames[i % len(frames)])
+        elapsed = time.perf_counter() - start
+        results["live" if mode == "color" else "saved"] = iterations / elapsed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Edge overlay throughput on this machine")
+    parser.add_argument("--image", help="image to benchmark on (default: random frame)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "W", "H"))
+    args = parser.parse_args()
+
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            raise SystemExit(f"Could not read {args.image}")
+    else:
+        rng = np.random.default_rng(0)
+        frame = cv2.GaussianBlur(rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8), (5, 5), 0)
+
+    height, width = frame.shape[:2]
+    results = benchmark([frame], args.iterations, roi=args.roi)
+    print(f"{width}x{height}" + (f" roi {args.roi}" if args.roi else ""))
+    for mode, fps in results.items():
+        print(f"  {mode:<5} {fps:7.1f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
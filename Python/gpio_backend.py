@@ -0,0 +1,161 @@
+import time
+import threading
+import statistics
+
+
+class RPiGPIOBackend:
+    """The real pins, through RPi.GPIO"""
+
+    def __init__(self):
+        import RPi.GPIO as gpio
+        self.gpio = gpio
+        self.BCM = gpio.BCM
+        self.OUT = gpio.OUT
+        self.IN = gpio.IN
+        self.HIGH = gpio.HIGH
+        self.LOW = gpio.LOW
+
+    def setmode(self, mode):
+        self.gpio.setmode(mode)
+
+    def setwarnings(self, flag):
+        self.gpio.setwarnings(flag)
+
+    def setup(self, channel, direction, **kwargs):
+        self.gpio.setup(channel, direction, **kwargs)
+
+    def output(self, channel, value):
+        self.gpio.output(channel, value)
+
+    def input(self, channel):
+        return self.gpio.input(channel)
+
+    def cleanup(self, *args):
+        self.gpio.cleanup(*args)
+
+
+class SimulatedGPIOBackend:
+    """Stand-in for RPi.GPIO that timestamps every pin transition
+
+    Nothing is driven, but every output() call that changes a pin is recorded as
+    (time, pin, level), so the step rate, jitter and missed deadlines of the motor
+    controllers can be measured on any machine.
+    """
+
+    BCM = "BCM"
+    OUT = "OUT"
+    IN = "IN"
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.levels = {}
+        self.modes = {}
+        # (timestamp, pin, level) for every change of level
+        self.transitions = []
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, **kwargs):
+        for pin in self._channels(channel):
+            self.modes[pin] = direction
+            self.levels.setdefault(pin, kwargs.get("initial", self.LOW) or self.LOW)
+
+    def output(self, channel, value):
+        pins = self._channels(channel)
+        values = list(value) if isinstance(value, (list, tuple)) else [value] * len(pins)
+        if len(values) != len(pins):
+            raise ValueError("GPIO.output needs one value per channel")
+
+        now = self.clock()
+        with self.lock:
+            for pin, level in zip(pins, values):
+                level = 1 if level else 0
+                if self.levels.get(pin) != level:
+                    self.levels[pin] = level
+                    self.transitions.append((now, pin, level))
+
+    def input(self, channel):
+        return self.levels.get(channel, self.LOW)
+
+    def cleanup(self, *args):
+        self.levels.clear()
+        self.modes.clear()
+
+    def _channels(self, channel):
+        return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+    def clear(self):
+        """Forget the recorded waveform (pin levels are kept)"""
+        with self.lock:
+            self.transitions = []
+
+    def waveform(self, pins=None, start=None, end=None):
+        """Recorded transitions, optionally only for the given pins and time window"""
+        with self.lock:
+            transitions = list(self.transitions)
+        if pins is not None:
+            pins = set(pins)
+            transitions = [t for t in transitions if t[1] in pins]
+        if start is not None or end is not None:
+            start = float("-inf") if start is None else start
+            end = float("inf") if end is None else end
+            transitions = [t for t in transitions if start <= t[0] <= end]
+        return transitions
+
+    def step_times(self, pins, start=None, end=None):
+        """Times at which any of the pins changed; a bulk write counts once"""
+        times = []
+        for timestamp, _, _ in self.waveform(pins, start, end):
+            if not times or times[-1] != timestamp:
+                times.append(timestamp)
+        return times
+
+    def timing_report(self, pins, expected_delays=None, tolerance=0.5, start=None, end=None):
+        """Step rate and jitter for a motor's pins (optionally only between start and end)
+
+        With expected_delays (the delay table the move was scheduled from), each interval
+        between steps is compared with its own delay: jitter is the spread of those errors
+        and a step counts as a missed deadline when it lands more than tolerance x its
+        delay late. One late step doesn't make the steps after it late too, as run_steps
+        catches up or restarts its schedule after a hiccup.
+        """
+        times = self.step_times(pins, start, end)
+        intervals = [b - a for a, b in zip(times, times[1:])]
+        report = {
+            "steps": len(times),
+            "duration": times[-1] - times[0] if len(times) > 1 else 0.0,
+            "step_rate": 0.0,
+            "jitter": 0.0,
+            "max_interval": max(intervals) if intervals else 0.0,
+            "missed_deadlines": 0,
+        }
+        if not intervals:
+            return report
+        report["step_rate"] = len(intervals) / sum(intervals)
+
+        if expected_delays is None:
+            report["jitter"] = statistics.pstdev(intervals)
+            return report
+
+        # how late each step landed after the one before it
+        errors = [interval - delay for interval, delay in zip(intervals, expected_delays)]
+        report["missed_deadlines"] = sum(1 for error, delay in zip(errors, expected_delays)
+                                         if error > delay * tolerance)
+        report["jitter"] = statistics.pstdev(errors)
+        report["max_late"] = max(errors)
+        return report
+
+def get_gpio_backend(name):
+    """'rpi' for the real pins, 'sim' for the recording simulator"""
+    if name == "rpi":
+        return RPiGPIOBackend()
+    if name == "sim":
+        return SimulatedGPIOBackend()
+    raise ValueError(f"Unknown GPIO backend: {name}")
@@ -0,0 +1,125 @@
+import os
+import glob
+import argparse
+import cv2
+import numpy as np
+
+
+# level name -> width in pixels; "full" is always the saved image itself
+DEFAULT_LEVELS = {"preview": 640, "thumb": 160}
+
+
+def pyramid_path(file_path, level):
+    """Where a level of an image is saved: next to it, as <name>.<level>.jpg"""
+    if level == "full":
+        return file_path
+    stem, ext = os.path.splitext(file_path)
+    return f"{stem}.{level}{ext or '.jpg'}"
+
+
+def is_pyramid_level(file_path):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.splitext(stem)[1][1:] in DEFAULT_LEVELS
+
+
+def build_pyramid(frame, levels=None):
+    """[(level, image)] from largest to smallest, each one downscaled from the level above it"""
+    levels = DEFAULT_LEVELS if levels is None else levels
+    height, width = frame.shape[:2]
+    images = []
+    source = frame
+    for level, level_width in sorted(levels.items(), key=lambda item: -item[1]):
+        if level_width >= width:
+            continue
+        size = (level_width, max(1, round(height * level_width / width)))
+        source = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+        images.append((level, source))
+    return images
+
+
+def backfill(folder, levels=None, jpeg_quality=90):
+    """Build the missing levels for images saved before pyramids were written"""
+    count = 0
+    for path in sorted(glob.glob(os.path.join(folder, "**", "*.jpg"), recursive=True)):
+        if is_pyramid_level(path):
+            continue
+        wanted = [level for level in (levels or DEFAULT_LEVELS) if not os.path.exists(pyramid_path(path, level))]
+        if not wanted:
+            continue
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        for level, image in build_pyramid(frame, levels):
+            cv2.imwrite(pyramid_path(path, level), image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        count += 1
+    return count
+
+
+def contact_sheet(image_paths, level="thumb", columns=8, label=True):
+    """One image with a tile per capture, read from the given pyramid level only
+
+    Images without that level get a blank tile rather than a full-size decode.
+    """
+    tiles = []
+    for path in image_paths:
+        tile = cv2.imread(pyramid_path(path, level))
+        tiles.append((os.path.basename(path), tile))
+    sizes = [tile.shape[:2] for _, tile in tiles if tile is not None]
+    if not sizes:
+        return None
+    tile_height = max(height for height, _ in sizes)
+    tile_width = max(width for _, width in sizes)
+
+    rows = (len(tiles) + columns - 1) // columns
+    sheet = np.zeros((rows * tile_height, min(columns, len(tiles)) * tile_width, 3), np.uint8)
+    for i, (name, tile) in enumerate(tiles):
+        y, x = (i // columns) * tile_height, (i % columns) * tile_width
+        if tile is not None:
+            sheet[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+        if label:
+            cv2.putText(sheet, name, (x + 3, y + tile_height - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.3, (255, 255, 255), 1, cv2.LINE_AA)
+    return sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image pyramids: contact sheets from the small levels, backfilling old images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sheet = commands.add_parser("sheet", help="contact sheet of the images in a folder (or a catalog query)")
+    sheet.add_argument("folder", nargs="?")
+    sheet.add_argument("output")
+    sheet.add_argument("--level", default="thumb", choices=sorted(DEFAULT_LEVELS))
+    sheet.add_argument("--columns", type=int, default=8)
+    sheet.add_argument("--catalog", help="pick images from this capture catalog instead of a folder")
+    sheet.add_argument("--tool")
+    sheet.add_argument("--layer")
+    sheet.add_argument("--position")
+    fill = commands.add_parser("backfill", help="build missing levels for existing images")
+    fill.add_argument("folder")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        print(f"Built pyramids for {backfill(args.folder)} images")
+        return
+
+    if args.catalog:
+        from capture_catalog import CaptureCatalog
+        catalog = CaptureCatalog(args.catalog)
+        paths = [row["path"] for row in catalog.query(args.tool, layer=args.layer, position=args.position)]
+        catalog.close()
+    elif args.folder:
+        # only list the originals, never decode them
+        paths = [path for path in sorted(glob.glob(os.path.join(args.folder, "**", "*.jpg"), recursive=True))
+                 if not is_pyramid_level(path)]
+    else:
+        raise SystemExit("Give a folder or --catalog")
+
+    image = contact_sheet(paths, args.level, args.columns)
+    if image is None:
+        raise SystemExit(f"No {args.level} images found")
+    cv2.imwrite(args.output, image)
+    print(f"Wrote {len(paths)} tiles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import queue
+import threading
+import cv2
+from tracing import span
+from image_pyramid import build_pyramid, pyramid_path
+
+
+def format_metadata(metadata):
+    return ";".join(f"{key}={value}" for key, value in metadata.items())
+
+
+def add_jpeg_comment(data, text):
+    """Insert a COM segment right after the SOI marker of an encoded JPEG"""
+    if data[:2] != b"\xff\xd8":
+        return data
+    payload = text.encode("utf-8")[:65533]
+    segment = b"\xff\xfe" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return data[:2] + segment + data[2:]
+
+
+def read_jpeg_comment(path):
+    """Metadata dict stored by the pipeline in a JPEG's comment ({} if there is none)"""
+    with open(path, "rb") as f:
+        data = f.read(65536 + 4)
+    if data[:4] != b"\xff\xd8\xff\xfe":
+        return {}
+    length = int.from_bytes(data[4:6], "big")
+    text = data[6:4 + length].decode("utf-8", errors="replace")
+    return dict(item.split("=", 1) for item in text.split(";") if "=" in item)
+
+
+class ImageWriterPipeline:
+    """Encodes and saves captured frames on background workers so motion doesn't wait on the SD card
+
+    Frames go into a bounded queue, a pool of encoder workers runs any per-frame
+    processing (e.g. the edge overlay) and turns them into JPEG bytes, and writer workers
+    put those bytes on disk. submit() blocks when the queue is full
+    (backpressure), and flush() is the barrier that waits until everything queued so far
+    has been written. With a sink (an object with write(file_path, data), e.g.
+    tool_archive.ArchiveSink) the bytes go there instead of into one file per image.
+    pyramid (level name -> width, see image_pyramid) also saves downscaled copies of every
+    frame, made from the frame already in memory.
+    """
+
+    def __init__(self, queue_size=16, encoders=2, writers=1, jpeg_quality=95, sink=None, pyramid=None,
+                 pyramid_quality=85):
+        self.jpeg_quality = jpeg_quality
+        self.sink = sink
+        self.pyramid = pyramid
+        self.pyramid_quality = pyramid_quality
+        # optional function file_path -> None called (on a writer thread) after each successful write
+        self.on_write = None
+        self.encode_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+
+        self.lock = threading.Lock()
+        self.written = []
+        # (file_path, error message) for every frame that never made it to disk
+        self.failed = []
+        # the same for pyramid levels, kept apart: the full image can be fine without them
+        # (image_pyramid.py backfill makes them again); last_failed_levels is from the last flush
+        self.failed_levels = []
+        self.last_failed_levels = []
+
+        self.workers = []
+        for i in range(encoders):
+            self._start_worker(self._encode_worker, f"image-encoder-{i}")
+        for i in range(writers):
+            self._start_worker(self._write_worker, f"image-writer-{i}")
+
+    def _start_worker(self, target, name):
+        worker = threading.Thread(target=target, name=name, daemon=True)
+        worker.start()
+        self.workers.append((worker, target))
+
+    def submit(self, frame, file_path, process=None, metadata=None, timeout=None):
+        """Queue a frame to be saved at file_path (blocks while the queue is full)
+
+        process is an optional function frame -> frame run on the worker before encoding,
+        so image processing stays off the capture/motion thread too. metadata (a dict) is
+        stored in the JPEG as a comment, see read_jpeg_comment().
+        """
+        self.encode_queue.put((frame, file_path, process, metadata), timeout=timeout)
+
+    def _record_failure(self, file_path, error, level=False):
+        print(f"Failed to save {file_path}: {error}")
+        with self.lock:
+            (self.failed_levels if level else self.failed).append((file_path, str(error)))
+
+    def _encode_worker(self):
+        while True:
+            job = self.encode_queue.get()
+            try:
+                if job is None:
+                    return
+                frame, file_path, process, metadata = job
+                try:
+                    if process is not None:
+                        with span("image.process"):
+                            frame = process(frame)
+                    ext = os.path.splitext(file_path)[1] or ".jpg"
+                    with span("image.encode"):
+                        ok, encoded = cv2.imencode(ext, frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if not ok:
+                        raise RuntimeError("encoding failed")
+                    data = encoded.tobytes()
+                    if metadata:
+                        data = add_jpeg_comment(data, format_metadata(metadata))
+                    self.write_queue.put((data, file_path, False))
+                except Exception as e:
+                    self._record_failure(file_path, e)
+                    continue
+                if self.pyramid:
+                    try:
+                        self._encode_pyramid(frame, file_path, ext, metadata)
+                    except Exception as e:
+                        self._record_failure(file_path, f"pyramid: {e}", level=True)
+            finally:
+                self.encode_queue.task_done()
+
+    def _encode_pyramid(self, frame, file_path, ext, metadata):
+        with span("image.pyramid"):
+            for level, image in build_pyramid(frame, self.pyramid):
+                ok, encoded = cv2.imencode(ext, image, [cv2.IMWRITE_JPEG_QUALITY, self.pyramid_quality])
+                if not ok:
+                    self._record_failure(pyramid_path(file_path, level), "encoding failed", level=True)
+                    continue
+                data = encoded.tobytes()
+                if metadata:
+                    data = add_jpeg_comment(data, format_metadata(dict(metadata, level=level)))
+                self.write_queue.put((data, pyramid_path(file_path, level), True))
+
+    def _write_worker(self):
+        while True:
+            job = self.write_queue.get()
+            try:
+                if job is None:
+                    return
+                data, file_path, level = job
+                try:
+                    with span("image.write"):
+                        if self.sink is not None:
+                            self.sink.write(file_path, data)
+                        else:
+                            self._write_file(file_path, data)
+                    with self.lock:
+                        self.written.append(file_path)
+                except Exception as e:
+                    self._record_failure(file_path, e, level)
+                else:
+                    if self.on_write is not None:
+                        try:
+                            self.on_write(file_path)
+                        except Exception as e:
+                            print(f"on_write failed for {file_path}: {e}")
+            finally:
+                self.write_queue.task_done()
+
+    def _write_file(self, file_path, data):
+        # write to a temp name first so a crash never leaves half a JPEG behind
+        tmp_path = file_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def pending(self):
+        return self.encode_queue.unfinished_tasks + self.write_queue.unfinished_tasks
+
+    def wait(self):
+        """Block until every frame queued so far has been processed and written"""
+        self.encode_queue.join()
+        self.write_queue.join()
+
+    def flush(self):
+        """Wait until every queued frame is written; returns the failures since the last flush
+
+        Only full images count; pyramid levels that failed are left in last_failed_levels.
+        """
+        self.wait()
+        with self.lock:
+            failed, self.failed = self.failed, []
+            self.last_failed_levels, self.failed_levels = self.failed_levels, []
+            self.written = []
+        return failed
+
+    def close(self):
+        """Flush, then stop all workers (and close the sink)"""
+        failed = self.flush()
+        for worker, target in self.workers:
+            if target == self._encode_worker:
+                self.encode_queue.put(None)
+            else:
+                self.write_queue.put(None)
+        for worker, _ in self.workers:
+            worker.join()
+        if self.sink is not None:
+            self.sink.close()
+        return failed
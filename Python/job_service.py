@@ -0,0 +1,267 @@
+import os
+import json
+import queue
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from station_loader import load_station
+from batch_runner import JobQueue, run_queue, parse_job
+from image_pyramid import is_pyramid_level
+
+
+class EventBroker:
+    """Fans events out to every connected client
+
+    Each client gets its own small queue; a client that stops reading loses events instead
+    of slowing the station down. The last history events are kept so a client reconnecting
+    with Last-Event-ID gets what it missed.
+    """
+
+    def __init__(self, history=500, client_queue=1000):
+        self.lock = threading.Lock()
+        self.clients = []
+        self.history = deque(maxlen=history)
+        self.client_queue = client_queue
+        self.next_id = 1
+
+    def publish(self, kind, **data):
+        with self.lock:
+            event = (self.next_id, kind, data)
+            self.next_id += 1
+            self.history.append(event)
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def subscribe(self, last_id=None):
+        client = queue.Queue(maxsize=self.client_queue)
+        with self.lock:
+            if last_id is not None:
+                for event in self.history:
+                    if event[0] > last_id:
+                        client.put_nowait(event)
+            self.clients.append(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+
+class ImagingService:
+    """Runs queued tool jobs on the station one at a time and publishes what happens
+
+    Events: job_queued, job_started, progress (per capture position), image (every image
+    written, not its preview/thumbnail levels), job_finished (with its timing) and
+    job_cancelled.
+    """
+
+    def __init__(self, station, cameras, actuator, stepper, queue_path):
+        self.station = station
+        self.cameras = cameras
+        self.actuator = actuator
+        self.stepper = stepper
+        self.jobs = JobQueue(queue_path)
+        self.events = EventBroker()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.current = None
+        self.thread = None
+        cameras.writer.on_write = self._image_written
+
+    def _image_written(self, file_path):
+        if is_pyramid_level(file_path):
+            # the preview and thumbnail of an image aren't images of their own
+            return
+        job = self.current
+        self.events.publish("image", job=job["id"] if job else None, path=file_path)
+
+    def submit(self, jobs):
+        added = self.jobs.add(jobs)
+        for job in added:
+            self.events.publish("job_queued", job=job)
+        self.wakeup.set()
+        return added
+
+    def cancel(self, job_id):
+        cancelled = self.jobs.cancel(job_id)
+        if cancelled:
+            self.events.publish("job_cancelled", job=job_id)
+        return cancelled
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="imaging-service", daemon=True)
+        self.thread.start()
+        # jobs left over from before a restart start right away
+        self.wakeup.set()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _before_job(self, job):
+        if not self.running:
+            return False
+        self.current = job
+        self.events.publish("job_started", job=job)
+        return True
+
+    def _progress(self, job, done, total, message):
+        self.events.publish("progress", job=job["id"], done=done, total=total, message=message)
+
+    def _finished(self, job):
+        self.current = None
+        self.events.publish("job_finished", job=job)
+
+    def _run(self):
+        while self.running:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            if not self.running:
+                break
+            run_queue(self.jobs, self.station, self.cameras, self.actuator, self.stepper,
+                      self._before_job, self._progress, self._finished)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API:
+
+    POST /jobs            {"tool": .., "flute": .., "layer": ..} or a list of them
+    GET  /jobs            every job with its status and timing
+    GET  /jobs/<id>       one job
+    DELETE /jobs/<id>     cancel a job that hasn't started
+    GET  /events          server-sent event stream of progress
+    """
+
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_id(self):
+        """The id at the end of the path; None after answering 400 if it isn't a number"""
+        try:
+            return int(self.path.rstrip("/").rsplit("/", 1)[1])
+        except ValueError:
+            self._send_json(400, {"error": "invalid job id"})
+            return None
+
+    def do_GET(self):
+        if self.path == "/jobs":
+            self._send_json(200, self.service.jobs.snapshot())
+        elif self.path.startswith("/jobs/"):
+            job_id = self._job_id()
+            if job_id is None:
+                return
+            jobs = [job for job in self.service.jobs.snapshot() if job["id"] == job_id]
+            if jobs:
+                self._send_json(200, jobs[0])
+            else:
+                self._send_json(404, {"error": f"no job {job_id}"})
+        elif self.path == "/events":
+            self._stream_events()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"null")
+            rows = body if isinstance(body, list) else [body]
+            jobs = [parse_job(row) for row in rows]
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(201, self.service.submit(jobs))
+
+    def do_DELETE(self):
+        if not self.path.startswith("/jobs/"):
+            self._send_json(404, {"error": "not found"})
+            return
+        job_id = self._job_id()
+        if job_id is None:
+            return
+        if self.service.cancel(job_id):
+            self._send_json(200, {"cancelled": job_id})
+        elif any(job["id"] == job_id for job in self.service.jobs.snapshot()):
+            self._send_json(409, {"error": "job is not pending"})
+        else:
+            self._send_json(404, {"error": f"no job {job_id}"})
+
+    def _stream_events(self):
+        last_id = self.headers.get("Last-Event-ID")
+        client = self.service.events.subscribe(int(last_id) if last_id and last_id.isdigit() else None)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    event_id, kind, data = client.get(timeout=15)
+                    message = f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+                except queue.Empty:
+                    # keeps the connection alive through proxies and notices closed clients
+                    message = ": ping\n\n"
+                self.wfile.write(message.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.service.events.unsubscribe(client)
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP job service for the imaging station")
+    parser.add_argument("--script", default="initial", help="initial, pi, or a path to a station script")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: this machine only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queue", help="job queue file (default: BASE_DIR/batch_queue.json)")
+    args = parser.parse_args()
+
+    station = load_station(args.script, headless=True)
+    cameras, actuator, stepper = station.create_hardware()
+    service = ImagingService(station, cameras, actuator, stepper,
+                             args.queue or os.path.join(station.BASE_DIR, "batch_queue.json"))
+    service.start()
+    server = serve(service, args.host, args.port)
+    print(f"Imaging service on http://{args.host}:{args.port} (POST /jobs, GET /events)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping after the current tool...")
+    finally:
+        server.server_close()
+        service.stop()
+        cameras.close()
+        station.GPIO.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import time
+import threading
+import cv2
+import numpy as np
+
+
+class LatestFrameReader:
+    """Reads one camera on its own thread and keeps only the newest frame
+
+    The display never waits for a camera and frames are never queued: whatever arrives
+    while the previous one hasn't been shown yet replaces it (and counts as dropped).
+    """
+
+    def __init__(self, capture, name="camera"):
+        self.capture = capture
+        self.name = name
+        self.lock = threading.Lock()
+        self.frame = None
+        # sequence number and capture time of self.frame
+        self.seq = 0
+        self.captured_at = 0.0
+        self.fps = 0.0
+        self.frame_time = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"preview-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        last = None
+        while self.running:
+            ret, frame = self.capture.read()
+            now = time.perf_counter()
+            if not ret:
+                time.sleep(0.05)
+                continue
+            if last is not None:
+                # smoothed frame interval, so the overlay doesn't flicker
+                interval = now - last
+                self.frame_time = interval if self.frame_time is None else 0.9 * self.frame_time + 0.1 * interval
+                self.fps = 1.0 / max(self.frame_time, 1e-6)
+            last = now
+            with self.lock:
+                self.frame = frame
+                self.seq += 1
+                self.captured_at = now
+
+    def latest(self):
+        """(sequence number, frame, capture time) of the newest frame (frame is None before the first)"""
+        with self.lock:
+            return self.seq, self.frame, self.captured_at
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+
+class MosaicRenderer:
+    """Draws the newest frame of every camera into one canvas allocated up front
+
+    Each tile is resized straight into its place in the canvas and only when that camera
+    has a new frame. The overlay shows the camera's frame rate, how old the frame was when
+    it was drawn, and how many frames were skipped because a newer one had already arrived.
+    """
+
+    def __init__(self, count, tile_size=(640, 480), columns=None, overlay=True):
+        self.count = count
+        self.tile_width, self.tile_height = tile_size
+        self.columns = columns or count
+        rows = (count + self.columns - 1) // self.columns
+        self.canvas = np.zeros((rows * self.tile_height, self.columns * self.tile_width, 3), np.uint8)
+        self.overlay = overlay
+        self.shown = [0] * count
+        self.dropped = [0] * count
+        self.latency = [0.0] * count
+        self.render_fps = 0.0
+        self.render_time = None
+        self.last_render = None
+
+    def tile(self, i):
+        """View of the canvas that camera i is drawn into"""
+        y = (i // self.columns) * self.tile_height
+        x = (i % self.columns) * self.tile_width
+        return self.canvas[y:y + self.tile_height, x:x + self.tile_width]
+
+    def render(self, readers):
+        now = time.perf_counter()
+        if self.last_render is not None:
+            interval = now - self.last_render
+            self.render_time = interval if self.render_time is None else 0.9 * self.render_time + 0.1 * interval
+            self.render_fps = 1.0 / max(self.render_time, 1e-6)
+        self.last_render = now
+
+        for i, reader in enumerate(readers):
+            seq, frame, captured_at = reader.latest()
+            tile = self.tile(i)
+            if frame is not None and seq != self.shown[i]:
+                if self.shown[i]:
+                    self.dropped[i] += seq - self.shown[i] - 1
+                self.shown[i] = seq
+                self.latency[i] = now - captured_at
+                if frame.shape[:2] == tile.shape[:2]:
+                    np.copyto(tile, frame)
+                else:
+                    # resize in case the actual resolution differs, straight into the canvas
+                    cv2.resize(frame, (self.tile_width, self.tile_height), dst=tile,
+                               interpolation=cv2.INTER_AREA)
+            elif frame is None:
+                tile[:] = 0
+
+            if self.overlay:
+                self._draw_stats(tile, reader, i)
+        return self.canvas
+
+    def _draw_stats(self, tile, reader, i):
+        # the strip is cleared first because a tile without a new frame keeps its old pixels
+        tile[:22] = 0
+        text = (f"{reader.name}  {reader.fps:4.1f} fps  {self.latency[i] * 1000:4.0f} ms  "
+                f"dropped {self.dropped[i]}")
+        cv2.putText(tile, text, (6, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1, cv2.LINE_AA)
@@ -0,0 +1,113 @@
+import time
+
+
+class MotionProfile:
+    """Precomputed per-step delay tables so a stepper ramps up and down instead of crawling
+
+    Speeds are in steps (entries of the step sequence) per second and acceleration in
+    steps/s^2. start_speed is the speed the motor can start/stop at without a ramp (the old
+    fixed step delay is a safe value). shape is "trapezoid" (constant acceleration) or
+    "scurve" (acceleration eases in and out, peak acceleration still equals acceleration).
+    """
+
+    def __init__(self, max_speed, acceleration, start_speed, shape="trapezoid"):
+        if shape not in ("trapezoid", "scurve"):
+            raise ValueError(f"Unknown motion profile shape: {shape}")
+        self.max_speed = max_speed
+        self.acceleration = acceleration
+        self.start_speed = min(start_speed, max_speed)
+        self.shape = shape
+        self.ramp = self._build_ramp()
+        self.tables = {}
+
+    def _position(self, t):
+        # steps travelled t seconds into the ramp
+        v0, dv = self.start_speed, self.max_speed - self.start_speed
+        if self.shape == "trapezoid":
+            return v0 * t + 0.5 * self.acceleration * t * t
+        # smoothstep velocity: v = v0 + dv * (3u^2 - 2u^3), u = t / T
+        T = self.ramp_time
+        u = t / T
+        return v0 * t + dv * T * (u ** 3 - u ** 4 / 2)
+
+    def _build_ramp(self):
+        """Delays for each step while accelerating from start_speed up to max_speed"""
+        dv = self.max_speed - self.start_speed
+        if dv <= 0 or self.acceleration <= 0:
+            self.ramp_time = 0.0
+            return []
+        # smoothstep's peak slope is 1.5, so the s-curve needs 1.5x longer to stay under the limit
+        self.ramp_time = dv / self.acceleration * (1.5 if self.shape == "scurve" else 1.0)
+        ramp_steps = int(self._position(self.ramp_time))
+
+        delays = []
+        previous = 0.0
+        for k in range(1, ramp_steps + 1):
+            # time at which step k is reached (bisection, position is monotonic in time)
+            lo, hi = previous, self.ramp_time
+            for _ in range(40):
+                mid = (lo + hi) / 2
+                if self._position(mid) < k:
+                    lo = mid
+                else:
+                    hi = mid
+            delays.append(hi - previous)
+            previous = hi
+        return delays
+
+    def delays(self, steps):
+        """Delay after each of `steps` steps: ramp up, cruise, ramp down (cached per length)"""
+        table = self.tables.get(steps)
+        if table is None:
+            ramp_steps = min(len(self.ramp), steps // 2)
+            ramp = self.ramp[:ramp_steps]
+            # short moves never reach max speed, they cruise at the speed the ramp got to
+            cruise_delay = self.ramp[ramp_steps] if ramp_steps < len(self.ramp) else 1.0 / self.max_speed
+            table = ramp + [cruise_delay] * (steps - 2 * ramp_steps) + ramp[::-1]
+            self.tables[steps] = table
+        return table
+
+    def duration(self, steps):
+        return sum(self.delays(steps))
+
+
+def constant_delays(step_delay, steps):
+    # the old fixed-sleep behaviour as a delay table
+    return [step_delay] * steps
+
+
+def run_steps(delays, step_fn, clock=time.perf_counter, sleep=time.sleep, spin_time=0.0005):
+    """Call step_fn(i) for every entry in delays, each one at its own deadline
+
+    Deadlines are measured from the start of the move rather than from the end of the last
+    sleep, so oversleeping on one step is made up on the next instead of adding up. The
+    last spin_time before a deadline is busy-waited because sleep() overshoots. If we fall
+    more than a whole step behind, the schedule restarts from now rather than firing a
+    burst of steps the motor can't follow. step_fn can return False to stop early.
+
+    Returns (steps_done, missed_deadlines, worst_lateness_seconds).
+    """
+    deadline = clock()
+    missed = 0
+    worst_late = 0.0
+    done = 0
+    for i, delay in enumerate(delays):
+        late = clock() - deadline
+        if late > 0:
+            worst_late = max(worst_late, late)
+            if late > delay:
+                missed += 1
+                deadline = clock()
+
+        if step_fn(i) is False:
+            break
+        done += 1
+
+        deadline += delay
+        remaining = deadline - clock()
+        if remaining > spin_time:
+            sleep(remaining - spin_time)
+        while clock() < deadline:
+            pass
+    return done, missed, worst_late
+
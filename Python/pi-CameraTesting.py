@@ -1,9 +1,11 @@
 import cv2
-import numpy as np
+from live_preview import LatestFrameReader, MosaicRenderer
 
 # adjust these if your cameras fail to open
 CAMERA_INDICES = [0, 2, 4]
 WIDTH, HEIGHT = 640, 480
+# per-camera fps / frame age / dropped frames drawn on each tile
+SHOW_STATS = True
 
 def main():
     # open captures
@@ -12,25 +14,20 @@ def main():
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, WIDTH)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
         cap.set(cv2.CAP_PROP_AUTOFOCUS, 0)
+        # keep the driver from queueing old frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # one thread per camera, each only keeps its newest frame
+    readers = [LatestFrameReader(cap, f"cam {idx}").start() for cap, idx in zip(caps, CAMERA_INDICES)]
+    # the mosaic is allocated once and every frame is resized straight into its tile
+    renderer = MosaicRenderer(len(caps), (WIDTH, HEIGHT), overlay=SHOW_STATS)
 
     cv2.namedWindow('All Cameras', cv2.WINDOW_NORMAL)
     cv2.resizeWindow('All Cameras', WIDTH * 3, HEIGHT)
 
     try:
         while True:
-            frames = []
-            for cap in caps:
-                ret, frame = cap.read()
-                if not ret:
-                    # if read fails, show a blank image
-                    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
-                else:
-                    # resize in case actual resolution differs
-                    frame = cv2.resize(frame, (WIDTH, HEIGHT))
-                frames.append(frame)
-
-            # stack horizontally
-            combined = np.hstack(frames)
+            combined = renderer.render(readers)
             cv2.imshow('All Cameras', combined)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -38,9 +35,12 @@ def main():
 
     finally:
         # cleanup
+        for reader in readers:
+            reader.stop()
         for cap in caps:
             cap.release()
         cv2.destroyAllWindows()
+        print(f"Preview ran at {renderer.render_fps:.1f} fps")
 
 if __name__ == '__main__':
     main()
@@ -1,19 +1,41 @@
-import tkinter as tk
-from tkinter import messagebox
 import os
-import cv2
+# TOOL_IMAGING_HEADLESS=1 loads the station without Tk (batch_runner.py, Pi without a display)
+HEADLESS = os.environ.get("TOOL_IMAGING_HEADLESS") == "1"
+if not HEADLESS:
+    import tkinter as tk
+    from tkinter import messagebox
+    from tkinter import ttk
 import time
 from datetime import datetime
 import threading
-import RPi.GPIO as GPIO
+from camera_pool import CameraPool, CaptureResult, STREAM
+from gpio_backend import get_gpio_backend
+from image_writer import ImageWriterPipeline
+from tool_archive import ArchiveSink
+from capture_catalog import CaptureCatalog, new_run_id
+from derived_images import DerivedImageCache
+from motion_profile import MotionProfile, constant_delays, run_steps
+from step_waveform import StepWaveform
+from settle_detector import SettleDetector
+from tracing import span, traced, tracer
+from ui_events import UIEventChannel, ProgressEstimator, format_eta
 
 # Hardware control flag (False for Windows) so set true on raspberry pi
 RUNNING_ON_RASPBERRY_PI = True
+# write a Chrome/Perfetto trace of every run next to its images
+TRACE_RUNS = False
 
 # Where the images are stored, changes depending on where you are storing it (this is an example)
 BASE_DIR = r'/home/seco-tools-capstone/image'
+# TOOL_IMAGING_BASE_DIR points the images somewhere else (benchmarks, headless runs)
+BASE_DIR = os.environ.get("TOOL_IMAGING_BASE_DIR", BASE_DIR)
 CANNY_THRESHOLD1 = 100  # Lower threshol
 CANNY_THRESHOLD2 = 200  # Upper threshold for edge detection
+# (x, y, w, h) to only look for edges in part of the frame, None for the whole frame
+EDGE_ROI = None
+# only raw frames are saved, overlays are made on request and cached here
+DERIVED_DIR = os.path.join(BASE_DIR, "derived")
+DERIVED_CACHE_MB = 512
 
 # Hardware Configuration
 # Actuator Pins (L298N)
@@ -44,25 +66,58 @@ STEPS_PER_REVOLUTION = 200
 # Using the GT2 Pulley: 20 teeth with 12.7mm pitch diameter
 GEAR_RATIO = 20/12.7
 
+# Turntable motion profile, in step sequence entries per second (and per second^2).
+# Start speed matches the old fixed 0.01s step delay, which is known not to stall.
+STEPPER_START_SPEED = 100
+STEPPER_MAX_SPEED = 400
+STEPPER_ACCELERATION = 4000
+STEPPER_PROFILE_SHAPE = "trapezoid"  # or "scurve"
+
 # Camera config
 NUM_CAMERAS = 3
 # USB
 CAMERA_INDICES = [0, 2, 4]
+# Adaptive settling: after a move, watch SETTLE_CAMERA and carry on as soon as consecutive
+# downscaled frames differ by less than SETTLE_THRESHOLD gray levels (mean) for SETTLE_STABLE_FRAMES
+# comparisons. The old fixed sleep times are kept as the timeout.
+ADAPTIVE_SETTLE = True
+SETTLE_CAMERA = CAMERA_INDICES[1]
+SETTLE_THRESHOLD = 1.5
+SETTLE_STABLE_FRAMES = 2
+
+# Burst capture: read BURST_FRAMES frames per camera and keep the sharpest (1 = single frame).
+# If the best one scores below SHARPNESS_FLOOR the burst is retaken up to MAX_RETAKES times.
+BURST_FRAMES = 3
+SHARPNESS_METHOD = "laplacian"  # or "tenengrad"
+SHARPNESS_FLOOR = 50.0
+MAX_RETAKES = 2
+# frames waiting to be encoded/saved before capture_images has to wait for the writer
+WRITE_QUEUE_SIZE = 16
+# saved images at 1280x720 while settling reads a 640x480 stream (the settle camera switches
+# between the two, the negotiated formats are cached); None streams 1280x720 all the time
+STILL_RESOLUTION = (1280, 720)
+# frames dropped after each switch (the first ones after a format change can be corrupt or dark)
+STILL_SWITCH_DISCARD = 1
+# append images to one archive per tool (BASE_DIR/archives/T<tool>) instead of loose JPEGs;
+# python tool_archive.py export ... turns an archive back into files (edge_overlay() needs them as files)
+ARCHIVE_IMAGES = False
+# every saved image gets a row here (python capture_catalog.py <path> --tool 42 --layer 3 ...)
+CATALOG_FILE = "catalog.sqlite"
+# downscaled copies saved next to every image (<name>.preview.jpg, <name>.thumb.jpg) for browsing
+# and contact sheets (python image_pyramid.py sheet ...); None saves the full image only
+PYRAMID_LEVELS = {"preview": 640, "thumb": 160}
+# overlap moving to the next position with processing/saving the last one
+# (False waits for every image to be saved before moving on, like the original sequence)
+PIPELINED_CAPTURE = True
 
 # Create base directory (if non existant)
 os.makedirs(BASE_DIR, exist_ok=True)
 
 
-if not RUNNING_ON_RASPBERRY_PI:
-    class DummyGPIO:
-        BCM = OUT = HIGH = LOW = IN = None
-        def setmode(self, *args, **kwargs): pass
-        def setwarnings(self, *args, **kwargs): pass
-        def setup(self, *args, **kwargs): pass
-        def output(self, *args, **kwargs): pass
-        def input(self, *args, **kwargs): return 0
-        def cleanup(self, *args, **kwargs): pass
-    GPIO = DummyGPIO()
+# "rpi" drives the real pins, "sim" records every pin transition with a timestamp so motor
+# timing can be measured off the Pi (TOOL_IMAGING_GPIO overrides the choice)
+GPIO_BACKEND = os.environ.get("TOOL_IMAGING_GPIO", "rpi" if RUNNING_ON_RASPBERRY_PI else "sim")
+GPIO = get_gpio_backend(GPIO_BACKEND)
 # GPIO(general-purpose input/output) Setup  handles both incoming and outgoing digital signals. As an input port, it can be used to communicate to the CPU the ON/OFF signals received from switches, or the digital readings received from sensors.
 def setup_gpio():
     GPIO.setmode(GPIO.BCM)
@@ -75,30 +130,45 @@ def setup_gpio():
     GPIO.output([ACT_IN1, ACT_IN2, STP_IN1, STP_IN2, STP_IN3, STP_IN4], GPIO.LOW)
 
 class StepperController:
-    def __init__(self, step_pins, step_sequence, steps_per_rev, gear_ratio):
+    def __init__(self, step_pins, step_sequence, steps_per_rev, gear_ratio, profile=None):
         self.step_pins = step_pins
         self.step_sequence = step_sequence
         self.steps_per_rev = steps_per_rev
         self.gear_ratio = gear_ratio
         self.step_delay = 0.01
         self.current_step = 0
-
+        # acceleration profile for moves (None keeps the old fixed step_delay)
+        self.profile = profile
+        # (steps done, missed deadlines, worst lateness) of the last move
+        self.last_move_stats = None
+        self.waveform_cw = StepWaveform(step_sequence, [step_pins])
+        self.waveform_ccw = StepWaveform(step_sequence[::-1], [step_pins])
+
+    @traced("stepper.rotate_degrees")
     def rotate_degrees(self, degrees, clockwise=True):
         # calculate steps needed to rotate by a specific angle in degrees
         steps = int((degrees / 360) * self.steps_per_rev * self.gear_ratio)
         direction = 1 if clockwise else -1
-        sequence = self.step_sequence if clockwise else self.step_sequence[::-1]
-        for _ in range(steps):
-            for step in sequence:
-                for pin in range(4):
-                    GPIO.output(self.step_pins[pin], step[pin])
-                time.sleep(self.step_delay)
+        waveform = self.waveform_cw if clockwise else self.waveform_ccw
+
+        # one delay per entry of the sequence, ramped when a profile is set
+        if self.profile is not None:
+            delays = self.profile.delays(steps * len(waveform))
+        else:
+            delays = constant_delays(self.step_delay, steps * len(waveform))
+
+        def step(i):
+            pins, levels = waveform.batch(i, first=i == 0)
+            GPIO.output(pins, levels)
+
+        self.last_move_stats = run_steps(delays, step)
 
 class ActuatorController:
     def __init__(self, in1, in2):
         self.in1 = in1
         self.in2 = in2
 
+    @traced("actuator.extend")
     def extend(self, duration=1.0):
         # extend the actuator so it moves tool holder up
         GPIO.output(self.in1, GPIO.HIGH)
@@ -106,6 +176,7 @@ class ActuatorController:
         time.sleep(duration)
         self.stop()
 
+    @traced("actuator.retract")
     def retract(self, duration=1.0):
         # retract the actuator so it move tool holder down
         GPIO.output(self.in1, GPIO.LOW)
@@ -117,63 +188,122 @@ class ActuatorController:
         GPIO.output(self.in1, GPIO.LOW)
         GPIO.output(self.in2, GPIO.LOW)
    
+derived_cache = DerivedImageCache(DERIVED_DIR, DERIVED_CACHE_MB * 1024 * 1024)
+
+def edge_overlay(file_path, threshold1=CANNY_THRESHOLD1, threshold2=CANNY_THRESHOLD2):
+    # path of the edge overlay for a raw capture, computed the first time it's asked for
+    params = {"threshold1": threshold1, "threshold2": threshold2}
+    if EDGE_ROI is not None:
+        params["roi"] = list(EDGE_ROI)
+    return derived_cache.get(file_path, "edges", **params)
+
+def frame_metadata(score):
+    # stored in the JPEG comment of every saved image
+    if score is None:
+        return None
+    return {"sharpness": f"{score:.1f}", "method": SHARPNESS_METHOD}
+
 class MicroscopeManager:
-    def __init__(self, camera_indices):
+    def __init__(self, camera_indices, camera_factory=None):
         self.camera_indices = camera_indices
         self.positions = ["top", "side", "interior"]
+        # cameras are opened and warmed up once and stay streaming for the whole session
+        # MJPG keeps three 720p streams inside the USB bandwidth when they are all open at once
+        self.pool = CameraPool(camera_indices, width=640 if STILL_RESOLUTION else 1280,
+                               height=480 if STILL_RESOLUTION else 720, fourcc="MJPG",
+                               camera_factory=camera_factory, still_size=STILL_RESOLUTION,
+                               switch_discard=STILL_SWITCH_DISCARD)
+        self.pool.open()
+        # JPEG encoding and SD card writes happen in the background
+        sink = ArchiveSink(os.path.join(BASE_DIR, "archives"), BASE_DIR) if ARCHIVE_IMAGES else None
+        self.writer = ImageWriterPipeline(queue_size=WRITE_QUEUE_SIZE, sink=sink, pyramid=PYRAMID_LEVELS)
+        self.failed_writes = []
+        self.catalog = CaptureCatalog(os.path.join(BASE_DIR, CATALOG_FILE))
+        self.run_id = new_run_id()
+        # watches one camera after each move to end the settle wait early
+        self.settle_detector = SettleDetector(
+            lambda: self.pool.read_stream(SETTLE_CAMERA),
+            flush=lambda: self.pool.flush(SETTLE_CAMERA, STREAM),
+            threshold=SETTLE_THRESHOLD, stable_frames=SETTLE_STABLE_FRAMES
+        )
 
-    def capture_images(self, tool_number, flute_number, layer_number, position):
-        """Capture images sequentially from each camera"""
+    def check_cameras(self):
+        """Make sure every camera is still delivering frames (reopens dead ones)"""
+        status = self.pool.check_health()
+        for idx, ok in status.items():
+            if not ok:
+                print(f"Camera {idx} is not responding")
+        return status
+
+    @traced("capture_images")
+    def capture_images(self, tool_number, flute_number, layer_number, position, parallel=True):
+        """Capture images from every camera (all at once unless parallel is False)"""
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         date_folder = datetime.now().strftime('%Y-%m-%d')
         folder_path = os.path.join(BASE_DIR, date_folder)
-        os.makedirs(folder_path, exist_ok=True)
+        if not ARCHIVE_IMAGES:
+            os.makedirs(folder_path, exist_ok=True)
         file_paths = []
 
+        start = time.perf_counter()
+        frames = self.pool.read_many(self.camera_indices, parallel=parallel,
+                                     burst=BURST_FRAMES, method=SHARPNESS_METHOD,
+                                     floor=SHARPNESS_FLOOR, retakes=MAX_RETAKES)
+        elapsed = time.perf_counter() - start
+        timings = {idx: seconds for idx, (_, _, seconds, _) in frames.items()}
+        scores = {idx: score for idx, (_, _, _, score) in frames.items() if score is not None}
+
         for idx, pos in zip(self.camera_indices, self.positions):
-            print(f"Opening camera {idx} for {pos} view...")
             try:
-                # open camera with V4L2 backend
-                cam = cv2.VideoCapture(idx, cv2.CAP_V4L2)
-                cam.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # Reduced resolution
-                cam.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-                cam.set(cv2.CAP_PROP_AUTOFOCUS, 0)
-                time.sleep(1.0)  # Warmup period
-
-                # capture stab frames
-                for _ in range(5):
-                    ret, frame = cam.read()
-                    time.sleep(0.1)
+                ret, frame, _, score = frames[idx]
 
                 if ret:
-                    # edge detection
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    edges = cv2.Canny(gray, CANNY_THRESHOLD1, CANNY_THRESHOLD2)
-                    edge_overlay = cv2.addWeighted(
-                        frame, 0.7,
-                        cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR), 0.3, 0
-                    )
-                   
                     # filename
                     filename = f"T{tool_number}_FL{flute_number}_OD{layer_number}_{pos}_{position}deg.jpg"
                     file_path = os.path.join(folder_path, filename)
-                    cv2.imwrite(file_path, edge_overlay)
+                    # raw frame only, edge_overlay(file_path) builds the overlay when it's needed
+                    self.writer.submit(frame, file_path, metadata=frame_metadata(score))
+                    self.catalog.add(tool_number, file_path, flute=flute_number, layer=layer_number,
+                                     angle=position, camera=idx, position=pos,
+                                     sharpness=score, run_id=self.run_id)
                     file_paths.append(file_path)
-                    print(f"Captured {pos} view: {filename}")
+                    print(f"Captured {pos} view: {filename} ({timings[idx] * 1000:.0f} ms)")
                 else:
                     print(f"Failed to capture image from camera {idx}")
 
             except Exception as e:
                 print(f"Error with camera {idx}: {str(e)}")
-            finally:
-                cam.release()
-              # USB 
-                time.sleep(0.5) 
 
-        return file_paths
+        return CaptureResult(file_paths, timings, elapsed, scores)
+
+    def wait_until_still(self, timeout):
+        """Block until the settle camera sees no more motion (at most timeout seconds)"""
+        return self.settle_detector.wait(timeout)
+
+    @traced("flush_writes")
+    def flush_writes(self):
+        """Wait for every queued image to be saved; returns [(path, error)] for the ones that failed"""
+        self.failed_writes = self.writer.flush()
+        if self.writer.last_failed_levels:
+            # the full images are saved, only some downscaled copies are missing
+            print(f"{len(self.writer.last_failed_levels)} preview/thumbnail images failed, "
+                  f"python image_pyramid.py backfill <folder> makes them again")
+        # images that were never saved don't belong in the catalog
+        if self.failed_writes:
+            self.catalog.remove([path for path, _ in self.failed_writes])
+        self.catalog.commit()
+        return self.failed_writes
+
+    def start_run(self):
+        """New run id for the catalog rows of the next captures"""
+        self.run_id = new_run_id()
+        return self.run_id
 
     def close(self):
-        print("All cameras released sequentially")
+        self.writer.close()
+        self.catalog.close()
+        self.pool.close()
+        print("All cameras released")
 
 def automated_capture_sequence(tool_number, flute_number, layer_number, cameras, actuator, stepper):
     try:
@@ -211,94 +341,19 @@ def automated_capture_sequence(tool_number, flute_number, layer_number, cameras,
         print(f"Capture sequence error: {e}")
         raise e
 
-class ToolInterface(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Tool Imaging Station")
-       
-        if RUNNING_ON_RASPBERRY_PI:
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-            GPIO.setup([ACT_IN1, ACT_IN2, STP_IN1, STP_IN2, STP_IN3, STP_IN4], GPIO.OUT)
-
-        self.stepper = StepperController(
-            step_pins=[STP_IN1, STP_IN2, STP_IN3, STP_IN4],
-            step_sequence=STEP_SEQ,
-            steps_per_rev=STEPS_PER_REVOLUTION,
-            gear_ratio=GEAR_RATIO
-        )
-        self.actuator = ActuatorController(ACT_IN1, ACT_IN2)
-        self.cameras = MicroscopeManager(CAMERA_INDICES)
-        self.create_widgets()
-
-    def create_widgets(self):
-        tk.Label(self, text="Tool Number:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
-        self.tool_entry = tk.Entry(self)
-        self.tool_entry.grid(row=0, column=1, padx=5, pady=5)
-       
-        tk.Label(self, text="Flute Number:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
-        self.flute_entry = tk.Entry(self)
-        self.flute_entry.grid(row=1, column=1, padx=5, pady=5)
-       
-        tk.Label(self, text="Layer Number:").grid(row=2, column=0, sticky="w", padx=5, pady=5)
-        self.layer_entry = tk.Entry(self)
-        self.layer_entry.grid(row=2, column=1, padx=5, pady=5)
-       
-        self.start_btn = tk.Button(self, text="Start Imaging", command=self.start_process)
-        self.start_btn.grid(row=3, column=0, padx=5, pady=10)
-       
-        self.status_text = tk.StringVar()
-        self.status_text.set("Ready to start...")
-        self.status_label = tk.Label(self, textvariable=self.status_text, bd=1, relief=tk.SUNKEN)
-        self.status_label.grid(row=4, columnspan=2, sticky="ew", padx=5, pady=5)
-
-    def start_process(self):
-        try:
-            tool_number = self.tool_entry.get().strip()
-            flute_number = self.flute_entry.get().strip()
-            layer_number = self.layer_entry.get().strip()
-           
-            if not all([tool_number, flute_number, layer_number]):
-                messagebox.showerror("Error", "All fields are required!")
-                return
-               
-            self.start_btn.config(state=tk.DISABLED)
-            self.status_text.set("Starting imaging sequence...")
-           
-            thread = threading.Thread(target=self.run_sequence, args=(tool_number, flute_number, layer_number))
-            thread.daemon = True
-            thread.start()
-           
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            self.start_btn.config(state=tk.NORMAL)
-
-    def run_sequence(self, tool_number, flute_number, layer_number):
-        try:
-            start_time = time.time()
-            image_paths = automated_capture_sequence(
-                tool_number, flute_number, layer_number,
-                self.cameras, self.actuator, self.stepper
-            )
-           
-            elapsed = time.time() - start_time
-            self.status_text.set(f"Captured {len(image_paths)} images in {elapsed:.1f}s")
-            messagebox.showinfo("Complete", f"Successfully captured {len(image_paths)} images")
-           
-        except Exception as e:
-            self.status_text.set(f"Error: {str(e)}")
-            messagebox.showerror("Error", str(e))
-        finally:
-            self.start_btn.config(state=tk.NORMAL)
-
-    def on_close(self):
-        self.cameras = None
-        GPIO.cleanup()
-        self.destroy()
-
-
-def automated_capture_sequence(tool_number, flute_number, layer_number, cameras, actuator, stepper):
-    #run  the automated capture sequence to get 20 images per tool
+def settle(seconds, cameras=None):
+    # wait for vibration to die down after a move; with adaptive settling the fixed time is only
+    # the upper bound and we carry on as soon as the camera image stops changing
+    with span("settle", seconds=seconds):
+        if ADAPTIVE_SETTLE and cameras is not None:
+            cameras.wait_until_still(seconds)
+        else:
+            time.sleep(seconds)
+
+@traced("automated_capture_sequence")
+def automated_capture_sequence(tool_number, flute_number, layer_number, cameras, actuator, stepper, pipelined=PIPELINED_CAPTURE,
+                               progress=None):
+    #run  the automated capture sequence to get 20 images per tool; progress(done, total, message) is called after every position
     try:
         # calculate angle increment for 20 positions by 360 degrees / 20 positions = 18 degrees per step
         angle_increment = 18
@@ -307,11 +362,15 @@ def automated_capture_sequence(tool_number, flute_number, layer_number, cameras,
         # 20 positions * 20 seconds = 400 seconds which would be 6.67 minutes
 
         all_file_paths = []
+        run_id = cameras.start_run()
+        print(f"Run {run_id}")
+        # time the sequence spent waiting on image processing/saving
+        write_wait = 0.0
 
         # initial positioning by starting with tool fully down
         actuator.retract(1.5)
         # wait for stability
-        time.sleep(0.5)
+        settle(0.5, cameras)
 
         # go through 20 positions
         for position in range(20):
@@ -321,21 +380,36 @@ def automated_capture_sequence(tool_number, flute_number, layer_number, cameras,
             # move to the measurement position and move the tool to camera view position
             actuator.extend(4.0)
             # wait for stability
-            time.sleep(1.0)
+            settle(1.0, cameras)
 
-            # capture images from all cameras
+            # capture images from all cameras; this returns as soon as the frames are in
+            # memory, encoding and saving happen in the background during the moves
             image_paths = cameras.capture_images(tool_number, flute_number, layer_number, current_angle)
             all_file_paths.extend(image_paths)
+            if progress:
+                progress(position + 1, 20, f"Position {position + 1}/20 ({current_angle}°)")
+
+            if not pipelined:
+                wait_start = time.perf_counter()
+                cameras.writer.wait()
+                write_wait += time.perf_counter() - wait_start
 
             # move back down
             actuator.retract(4.0)
-            time.sleep(1.0)
+            settle(1.0, cameras)
 
             # rotate to next position if not the last one
             if position < 19:
                 stepper.rotate_degrees(angle_increment)
                 #wait
-                time.sleep(1.0)
+                settle(1.0, cameras)
+
+        # barrier: the run isn't done until every image is on disk
+        wait_start = time.perf_counter()
+        failed_paths = {path for path, _ in cameras.flush_writes()}
+        write_wait += time.perf_counter() - wait_start
+        all_file_paths = [path for path in all_file_paths if path not in failed_paths]
+        print(f"Waited {write_wait:.2f}s on image processing/saving")
 
         #print(f"\nCapture sequence completed. Total images: {len(all_file_paths)}")
         return all_file_paths
@@ -344,28 +418,40 @@ def automated_capture_sequence(tool_number, flute_number, layer_number, cameras,
         print(f"Error during capture sequence: {e}")
         raise e
 
+def create_hardware(camera_factory=None):
+    """Set up GPIO and build the camera, actuator and turntable controllers"""
+    # set up GPIO
+    if RUNNING_ON_RASPBERRY_PI:
+        setup_gpio()
+
+    stepper = StepperController(
+        step_pins=[STP_IN1, STP_IN2, STP_IN3, STP_IN4],
+        step_sequence=STEP_SEQ,
+        steps_per_rev=STEPS_PER_REVOLUTION,
+        gear_ratio=GEAR_RATIO,
+        profile=MotionProfile(STEPPER_MAX_SPEED, STEPPER_ACCELERATION,
+                              STEPPER_START_SPEED, STEPPER_PROFILE_SHAPE)
+    )
+    actuator = ActuatorController(ACT_IN1, ACT_IN2)
+    cameras = MicroscopeManager(CAMERA_INDICES, camera_factory=camera_factory)
+    return cameras, actuator, stepper
+
 class ToolInterface:
     def __init__(self):
         self.window = tk.Tk()
         self.window.title("Tool Imaging Station")
 
-        # set up GPIO
-        if RUNNING_ON_RASPBERRY_PI:
-            setup_gpio()
-
-        # initialize hardware controllers
-        self.stepper = StepperController(
-            step_pins=[STP_IN1, STP_IN2, STP_IN3, STP_IN4],
-            step_sequence=STEP_SEQ,
-            steps_per_rev=STEPS_PER_REVOLUTION,
-            gear_ratio=GEAR_RATIO
-        )
-       
-        self.actuator = ActuatorController(ACT_IN1, ACT_IN2)
-        self.cameras = MicroscopeManager(CAMERA_INDICES)
+        # set up GPIO and initialize hardware controllers
+        self.cameras, self.actuator, self.stepper = create_hardware()
 
          # GUI elements
         self.create_widgets()
+        # worker threads never touch Tk directly, they post to this channel instead
+        self.events = UIEventChannel(self.window)
+        self.events.on("status", self.status_text.set)
+        self.events.on("progress", self.show_progress)
+        self.events.start()
+        self.estimator = ProgressEstimator()
 
     def create_widgets(self):
         # input
@@ -389,6 +475,12 @@ class ToolInterface:
         # ew is parameter in Tinker GUI ew aligns the widget to both left and right edges, making it stretch horizontally across its grid cell
         self.status_label.grid(row=4, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
 
+        # progress of the imaging run
+        self.progress_bar = ttk.Progressbar(self.window, mode="determinate", maximum=1.0)
+        self.progress_bar.grid(row=5, column=0, sticky="ew", padx=5, pady=2)
+        self.eta_text = tk.StringVar()
+        tk.Label(self.window, textvariable=self.eta_text, anchor=tk.W).grid(row=5, column=1, sticky="w", padx=5)
+
         # control buttons
         self.start_button = tk.Button(self.window, text="Start Imaging", command=self.start_process)
         self.start_button.grid(row=3, column=0, padx=5, pady=10)
@@ -397,9 +489,18 @@ class ToolInterface:
         self.exit_button.grid(row=3, column=1, padx=5, pady=10)
 
     def update_status(self, message):
-        # update status display
-        self.status_text.set(message)
-        self.window.update()
+        # safe from any thread, the Tk loop picks it up on its next drain
+        self.events.status(message)
+
+    def report_progress(self, done, total, message=None):
+        # progress callback for automated_capture_sequence (runs on the imaging thread)
+        self.events.progress(done, total, message)
+
+    def show_progress(self, done, total, message=None):
+        self.progress_bar["value"] = done / total if total else 0
+        self.eta_text.set(format_eta(self.estimator.eta(done, total)))
+        if message:
+            self.status_text.set(message)
 
     def start_process(self):
         # start the imaging process in a separate thread
@@ -432,35 +533,66 @@ class ToolInterface:
         try:
             start_time = time.time()
             self.update_status("Starting automated capture sequence...")
+            self.estimator.reset()
+            self.report_progress(0, 1)
+
+            # cameras stay open between runs, so make sure none dropped off the bus
+            self.cameras.check_cameras()
 
             # run the capture sequence
-            image_paths = automated_capture_sequence(
-                tool_number, flute_number, layer_number,
-                self.cameras, self.actuator, self.stepper
-            )
+            if TRACE_RUNS:
+                tracer.start()
+            try:
+                image_paths = automated_capture_sequence(
+                    tool_number, flute_number, layer_number,
+                    self.cameras, self.actuator, self.stepper,
+                    progress=self.report_progress
+                )
+            finally:
+                if TRACE_RUNS:
+                    tracer.stop()
+            if TRACE_RUNS:
+                # trace goes next to the images (open in ui.perfetto.dev or chrome://tracing)
+                trace_folder = os.path.dirname(image_paths[0]) if image_paths else BASE_DIR
+                trace_path = os.path.join(trace_folder, f"trace_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+                tracer.export_chrome(trace_path)
+                print(f"Trace written to {trace_path}")
 
             elapsed_time = time.time() - start_time
+            failed_writes = self.cameras.failed_writes
             self.update_status(f"Imaging complete! {len(image_paths)} images captured in {elapsed_time:.1f} seconds")
 
             # re-enable start button
-            self.window.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            self.events.call(lambda: self.start_button.config(state=tk.NORMAL))
 
             # completion message
-            self.window.after(0, lambda: messagebox.showinfo(
-                "Process Complete",
-                f"Successfully captured {len(image_paths)} images!\n"
-                f"Total time: {elapsed_time:.1f} seconds"
-            ))
+            if failed_writes:
+                failed_list = "\n".join(os.path.basename(path) for path, _ in failed_writes[:5])
+                self.events.call(lambda: messagebox.showwarning(
+                    "Process Complete",
+                    f"Captured {len(image_paths)} images, but {len(failed_writes)} could not be saved:\n"
+                    f"{failed_list}\n"
+                    f"Total time: {elapsed_time:.1f} seconds"
+                ))
+            else:
+                self.events.call(lambda: messagebox.showinfo(
+                    "Process Complete",
+                    f"Successfully captured {len(image_paths)} images!\n"
+                    f"Total time: {elapsed_time:.1f} seconds"
+                ))
 
         except Exception as e:
             self.update_status(f"Error: {str(e)}")
-            self.window.after(0, lambda: messagebox.showerror("Error", f"Imaging failed: {str(e)}"))
-            self.window.after(0, lambda: self.start_button.config(state=tk.NORMAL))
+            error = str(e)
+            self.events.call(lambda: messagebox.showerror("Error", f"Imaging failed: {error}"))
+            self.events.call(lambda: self.start_button.config(state=tk.NORMAL))
 
     def cleanup_and_exit(self):
         # clean up resources and exit
         try:
-            self.update_status("Cleaning up...")
+            self.events.stop()
+            self.status_text.set("Cleaning up...")
+            self.window.update_idletasks()
             self.cameras.close()
             GPIO.cleanup()
             self.window.destroy()
@@ -0,0 +1,163 @@
+import os
+import sys
+import glob
+import json
+import argparse
+from datetime import datetime
+
+
+class RunJournal:
+    """Durable record of how far a capture run got
+
+    One JSON line per event, each flushed and fsynced before the run moves on: a "start"
+    line with the tool parameters, a "step" line after every completed plan step (with the
+    axis positions after it and the files it queued), "resume" lines and a final "done".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _write(self, record):
+        record["time"] = datetime.now().isoformat(timespec="milliseconds")
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def start(self, run_id, tool_number, flute_number, layer_number, plan_length, **options):
+        self._write(dict(type="start", run_id=run_id, tool=str(tool_number), flute=str(flute_number),
+                         layer=str(layer_number), plan_length=plan_length, **options))
+
+    def step(self, index, kind, cam_height, turntable, files=()):
+        self._write({"type": "step", "index": index, "kind": kind, "cam_height": cam_height,
+                     "turntable": turntable, "files": list(files)})
+
+    def resume(self, index, cam_height, turntable):
+        self._write({"type": "resume", "index": index, "cam_height": cam_height, "turntable": turntable})
+
+    def finish(self, images):
+        self._write({"type": "done", "images": images})
+
+    def close(self):
+        self.file.close()
+
+
+def read_journal(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # torn last line from a crash, everything before it is intact
+                break
+    if not records or records[0]["type"] != "start":
+        raise ValueError(f"{path} is not a run journal")
+    return records
+
+
+class ResumePoint:
+    """Where an interrupted run picks up again
+
+    index is the first plan step still to do. A capture step only counts as done if every
+    file it queued made it to disk, so frames that were still in the write queue when the run
+    died are taken again. cam_height/turntable are where the axes were left (after the last
+    journaled step) and target_height/target_turntable where they have to be for step index.
+    """
+
+    def __init__(self, records, exists=os.path.exists):
+        self.start = records[0]
+        self.finished = any(record["type"] == "done" for record in records)
+        steps = {}
+        position = (0, 0)
+        for record in records[1:]:
+            if record["type"] == "step":
+                steps[record["index"]] = record
+                position = (record["cam_height"], record["turntable"])
+            elif record["type"] == "resume":
+                # a resume restarts from its index, anything journaled past it before is redone
+                steps = {index: step for index, step in steps.items() if index < record["index"]}
+                position = (record["cam_height"], record["turntable"])
+        self.cam_height, self.turntable = position
+
+        self.index = 0
+        self.files = []
+        self.target_height, self.target_turntable = 0, 0
+        while self.index in steps:
+            step = steps[self.index]
+            if not all(exists(path) for path in step["files"]):
+                break
+            self.files.extend(step["files"])
+            self.target_height, self.target_turntable = step["cam_height"], step["turntable"]
+            self.index += 1
+        # files of steps that will be redone (some may exist, they get overwritten)
+        self.redo_files = [path for index, step in steps.items() if index >= self.index for path in step["files"]]
+
+
+def cleanup_partial_files(folders):
+    """Remove .tmp files an interrupted writer left behind; returns how many"""
+    removed = 0
+    for folder in set(folders):
+        for path in glob.glob(os.path.join(folder, "*.tmp")):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def unfinished_runs(journal_dir):
+    """Journals of runs that never finished, newest first"""
+    runs = []
+    for path in glob.glob(os.path.join(journal_dir, "*.jsonl")):
+        try:
+            point = ResumePoint(read_journal(path))
+        except (ValueError, OSError):
+            continue
+        if not point.finished:
+            runs.append((os.path.getmtime(path), path, point))
+    return [(path, point) for _, path, point in sorted(runs, reverse=True)]
+
+
+def describe(path, point):
+    start = point.start
+    return (f"{os.path.basename(path)}: tool {start['tool']} ({start['flute']} flutes, {start['layer']} layers), "
+            f"step {point.index}/{start['plan_length']}, {len(point.files)} images kept")
+
+
+def main():
+    from station_loader import load_station
+
+    parser = argparse.ArgumentParser(description="List or resume interrupted capture runs")
+    parser.add_argument("command", choices=["list", "resume"])
+    parser.add_argument("journal", nargs="?", help="journal to resume (default: the newest unfinished run)")
+    parser.add_argument("--script", default="initial", help="initial or a path to a station script")
+    args = parser.parse_args()
+
+    station = load_station(args.script, headless=True)
+    runs = unfinished_runs(station.JOURNAL_DIR)
+    if args.command == "list":
+        for path, point in runs:
+            print(describe(path, point))
+        if not runs:
+            print("No unfinished runs")
+        return
+
+    journal = args.journal or (runs[0][0] if runs else None)
+    if journal is None:
+        raise SystemExit("No unfinished runs")
+    print(f"Resuming {describe(journal, ResumePoint(read_journal(journal)))}")
+
+    cameras, actuator, stepper = station.create_hardware()
+    try:
+        image_paths = station.resume_capture_sequence(journal, cameras, actuator, stepper)
+    finally:
+        cameras.close()
+        station.GPIO.cleanup()
+    print(f"Run complete: {len(image_paths)} images")
+    if cameras.failed_writes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
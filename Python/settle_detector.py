@@ -0,0 +1,89 @@
+import time
+import cv2
+import numpy as np
+
+
+class SettleDetector:
+    """Watches a camera after a move and reports the scene stable once frames stop changing
+
+    Each frame is turned into a small grayscale thumbnail (area averaging also smooths out
+    sensor noise) and compared with the previous one. When the mean absolute difference
+    stays under threshold (0-255 gray levels) for stable_frames comparisons in a row, the
+    vibration has died down. If that never happens, wait() gives up at the timeout, so it
+    is never slower than the fixed sleep it replaces.
+    """
+
+    def __init__(self, read_frame, flush=None, size=(80, 60), threshold=1.5, stable_frames=2):
+        self.read_frame = read_frame
+        self.flush = flush
+        self.size = size
+        self.threshold = threshold
+        self.stable_frames = stable_frames
+
+        # two thumbnails and a diff buffer, reused for every frame
+        width, height = size
+        self.previous = np.empty((height, width), np.uint8)
+        self.current = np.empty((height, width), np.uint8)
+        self.diff = np.empty((height, width), np.uint8)
+        self.gray = None
+
+        # totals over all waits, to see how much time adaptive settling saves
+        self.waits = 0
+        self.waited = 0.0
+        self.budget = 0.0
+        self.last = None
+
+    def _thumbnail(self, frame, out):
+        if frame.ndim == 3:
+            if self.gray is None or self.gray.shape != frame.shape[:2]:
+                self.gray = np.empty(frame.shape[:2], np.uint8)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+            frame = self.gray
+        cv2.resize(frame, self.size, dst=out, interpolation=cv2.INTER_AREA)
+
+    def wait(self, timeout):
+        """Block until the scene is still or timeout seconds have passed; returns seconds waited"""
+        start = time.perf_counter()
+        deadline = start + timeout
+        if self.flush is not None:
+            # frames already in the buffer may predate the move
+            self.flush()
+
+        have_previous = False
+        stable = 0
+        frames = 0
+        motion = None
+        settled = False
+        while time.perf_counter() < deadline:
+            ret, frame = self.read_frame()
+            if not ret:
+                # no camera to watch, fall back to the fixed wait
+                time.sleep(max(0.0, deadline - time.perf_counter()))
+                break
+            frames += 1
+            self._thumbnail(frame, self.current)
+
+            if have_previous:
+                cv2.absdiff(self.current, self.previous, dst=self.diff)
+                motion = cv2.mean(self.diff)[0]
+                stable = stable + 1 if motion < self.threshold else 0
+                if stable >= self.stable_frames:
+                    settled = True
+                    break
+            self.previous, self.current = self.current, self.previous
+            have_previous = True
+
+        waited = time.perf_counter() - start
+        self.waits += 1
+        self.waited += waited
+        self.budget += timeout
+        self.last = {"seconds": waited, "frames": frames, "motion": motion, "settled": settled}
+        return waited
+
+    def report(self):
+        return {
+            "waits": self.waits,
+            "waited": self.waited,
+            "budget": self.budget,
+            "saved": self.budget - self.waited,
+        }
@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+
+
+def _gray(frame):
+    if frame.ndim == 3:
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return frame
+
+
+def variance_of_laplacian(frame):
+    """Focus measure: variance of the Laplacian (higher is sharper)"""
+    laplacian = cv2.Laplacian(_gray(frame), cv2.CV_32F)
+    _, std = cv2.meanStdDev(laplacian)
+    return float(std[0][0] ** 2)
+
+
+def tenengrad(frame):
+    """Focus measure: mean squared Sobel gradient magnitude (higher is sharper)"""
+    gray = _gray(frame)
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    return float(cv2.mean(cv2.magnitude(gx, gy) ** 2)[0])
+
+
+METHODS = {
+    "laplacian": variance_of_laplacian,
+    "tenengrad": tenengrad,
+}
+
+
+def score(frame, method="laplacian"):
+    return METHODS[method](frame)
+
+
+def sharpest(frames, method="laplacian"):
+    """(index, score) of the sharpest frame in a burst"""
+    scores = [score(frame, method) for frame in frames]
+    best = int(np.argmax(scores))
+    return best, scores[best]
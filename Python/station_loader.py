@@ -0,0 +1,32 @@
+import os
+import importlib.util
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the station scripts have spaces/dashes in their file names, so they can't be imported normally
+STATION_SCRIPTS = {
+    "initial": "Initial Python Code.py",
+    "pi": "pi-code.py",
+}
+
+
+def load_station(script="initial", gpio=None, base_dir=None, headless=False):
+    """Import a station script as a module (its __main__ block doesn't run)
+
+    gpio picks the GPIO backend ("rpi"/"sim") and base_dir where images go; both have to
+    be set before the script runs because it reads them at import time. headless loads it
+    without importing tkinter (the Tk interface is then unusable).
+    """
+    if gpio is not None:
+        os.environ["TOOL_IMAGING_GPIO"] = gpio
+    if base_dir is not None:
+        os.environ["TOOL_IMAGING_BASE_DIR"] = base_dir
+    if headless:
+        os.environ["TOOL_IMAGING_HEADLESS"] = "1"
+
+    path = os.path.join(SCRIPT_DIR, STATION_SCRIPTS.get(script, script))
+    name = "station_" + os.path.splitext(os.path.basename(path))[0].replace(" ", "_").replace("-", "_").lower()
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,41 @@
+class StepWaveform:
+    """A step sequence compiled against the pins of one or more motors
+
+    Every phase becomes a single (pins, levels) batch that can go out in one
+    GPIO.output(pins, levels) call, no matter how many motors share the sequence.
+    deltas holds only the pins that change from the previous phase (the sequence wraps
+    around), so once a move has written its first full phase the rest only touch the
+    pins that actually toggle.
+    """
+
+    def __init__(self, step_sequence, pin_groups):
+        self.pin_groups = [list(group) for group in pin_groups]
+        self.pins = [pin for group in self.pin_groups for pin in group]
+
+        # full batch per phase: every motor gets the same pattern on its own pins
+        self.phases = []
+        for step in step_sequence:
+            levels = []
+            for group in self.pin_groups:
+                if len(group) != len(step):
+                    raise ValueError(f"Motor pins {group} don't match a {len(step)}-wire step sequence")
+                levels.extend(step)
+            self.phases.append((list(self.pins), levels))
+
+        # changed-pins-only batch per phase, relative to the phase before it
+        self.deltas = []
+        for i, (pins, levels) in enumerate(self.phases):
+            previous = self.phases[i - 1][1]
+            changed = [k for k in range(len(pins)) if levels[k] != previous[k]]
+            self.deltas.append(([pins[k] for k in changed], [levels[k] for k in changed]))
+
+    def __len__(self):
+        return len(self.phases)
+
+    def batch(self, index, first=False):
+        """(pins, levels) to write for step `index` of a move; the first step writes every pin"""
+        phase = index % len(self.phases)
+        if first:
+            return self.phases[phase]
+        return self.deltas[phase]
+
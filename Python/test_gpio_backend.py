@@ -0,0 +1,92 @@
+import unittest
+from gpio_backend import SimulatedGPIOBackend
+from motion_profile import MotionProfile, run_steps
+
+PINS = [17, 18, 27, 22]
+SEQUENCE = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+
+
+class FakeClock:
+    """A clock that only moves when slept on, plus a tick per reading so busy-waits end"""
+
+    def __init__(self, tick=1e-6):
+        self.now = 0.0
+        self.tick = tick
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+def step_at(gpio, i):
+    gpio.output(PINS, SEQUENCE[i % len(SEQUENCE)])
+
+
+class TimingReportTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(tick=0.0)
+        self.gpio = SimulatedGPIOBackend(clock=self.clock)
+        self.gpio.setup(PINS, self.gpio.OUT)
+
+    def play(self, times):
+        for i, timestamp in enumerate(times):
+            self.clock.now = timestamp
+            step_at(self.gpio, i)
+
+    def test_on_schedule(self):
+        delays = MotionProfile(max_speed=500, acceleration=5000, start_speed=100).delays(40)
+        times = [0.0]
+        for delay in delays[:-1]:
+            times.append(times[-1] + delay)
+        self.play(times)
+
+        report = self.gpio.timing_report(PINS, delays)
+        self.assertEqual(report["steps"], 40)
+        self.assertEqual(report["missed_deadlines"], 0)
+        self.assertAlmostEqual(report["jitter"], 0.0)
+        self.assertAlmostEqual(report["step_rate"], 39 / sum(delays[:-1]))
+
+    def test_one_hiccup_is_one_missed_deadline(self):
+        # step 5 lands three periods late and the schedule restarts from there, like run_steps
+        delays = [0.002] * 20
+        times = [0.002 * i for i in range(5)] + [0.002 * 4 + 0.008 + 0.002 * i for i in range(15)]
+        self.play(times)
+
+        report = self.gpio.timing_report(PINS, delays)
+        self.assertEqual(report["missed_deadlines"], 1)
+        self.assertAlmostEqual(report["max_late"], 0.006)
+
+    def test_window(self):
+        self.play([0.001 * i for i in range(10)] + [1.0 + 0.002 * i for i in range(10)])
+
+        report = self.gpio.timing_report(PINS, [0.002] * 9, start=0.5, end=2.0)
+        self.assertEqual(report["steps"], 10)
+        self.assertEqual(report["missed_deadlines"], 0)
+        self.assertAlmostEqual(report["step_rate"], 500.0)
+
+
+class RunStepsTimingTest(unittest.TestCase):
+    def test_report_matches_run_steps(self):
+        clock = FakeClock()
+        gpio = SimulatedGPIOBackend(clock=clock)
+        gpio.setup(PINS, gpio.OUT)
+        delays = MotionProfile(max_speed=500, acceleration=5000, start_speed=100).delays(100)
+
+        def step(i):
+            if i == 50:
+                # the OS kept us away for a while
+                clock.sleep(0.02)
+            step_at(gpio, i)
+
+        done, missed, _ = run_steps(delays, step, clock=clock, sleep=clock.sleep)
+        report = gpio.timing_report(PINS, delays)
+        self.assertEqual(done, 100)
+        self.assertEqual(missed, 1)
+        self.assertEqual(report["missed_deadlines"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
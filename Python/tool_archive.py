@@ -0,0 +1,288 @@
+import os
+import re
+import mmap
+import json
+import time
+import fnmatch
+import argparse
+import threading
+
+
+# every record in a chunk starts with this header, so the index can be rebuilt from the chunks alone
+RECORD_MAGIC = b"TIAR"
+HEADER_SIZE = len(RECORD_MAGIC) + 4 + 8
+
+
+class ToolArchive:
+    """Append-only container for one tool's encoded images
+
+    The archive is a folder of chunk files (chunk-00000.dat, ...) that images are appended
+    to, each one capped at chunk_bytes, plus index.jsonl with one line per image: its name,
+    chunk, offset and length. An image is only added to the index after its bytes are in
+    the chunk, so a crash at worst loses the image being written. Reads memory-map the chunk
+    and slice the image out, without opening a file per image. Appending an existing name
+    again replaces it (the old bytes stay in the chunk).
+    """
+
+    def __init__(self, path, chunk_bytes=256 * 1024 * 1024, sync=False):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.sync = sync
+        self.lock = threading.Lock()
+        # name -> (chunk, offset, length)
+        self.index = {}
+        self.maps = {}
+        self.chunk = None
+        self.chunk_file = None
+        self.index_file = None
+        os.makedirs(path, exist_ok=True)
+        self._load_index()
+
+    def _chunk_path(self, chunk):
+        return os.path.join(self.path, f"chunk-{chunk:05d}.dat")
+
+    def _chunks(self):
+        chunks = []
+        for filename in os.listdir(self.path):
+            match = re.fullmatch(r"chunk-(\d+)\.dat", filename)
+            if match:
+                chunks.append(int(match.group(1)))
+        return sorted(chunks)
+
+    def _load_index(self):
+        index_path = os.path.join(self.path, "index.jsonl")
+        if not os.path.exists(index_path):
+            if self._chunks():
+                self.rebuild_index()
+            return
+        sizes = {chunk: os.path.getsize(self._chunk_path(chunk)) for chunk in self._chunks()}
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last line from a crash
+                    continue
+                # skip entries whose bytes never made it into the chunk
+                if entry["offset"] + entry["length"] <= sizes.get(entry["chunk"], -1):
+                    self.index[entry["name"]] = (entry["chunk"], entry["offset"], entry["length"])
+
+    def rebuild_index(self):
+        """Recreate index.jsonl by walking the record headers in every chunk"""
+        with self.lock:
+            self._close_writers()
+            self.index = {}
+            lines = []
+            for chunk in self._chunks():
+                with open(self._chunk_path(chunk), "rb") as f:
+                    offset = 0
+                    while True:
+                        header = f.read(HEADER_SIZE)
+                        if len(header) < HEADER_SIZE or header[:4] != RECORD_MAGIC:
+                            break
+                        name_length = int.from_bytes(header[4:8], "big")
+                        length = int.from_bytes(header[8:16], "big")
+                        name = f.read(name_length).decode("utf-8")
+                        data_offset = offset + HEADER_SIZE + name_length
+                        f.seek(length, os.SEEK_CUR)
+                        if f.tell() > os.fstat(f.fileno()).st_size:
+                            break
+                        self.index[name] = (chunk, data_offset, length)
+                        lines.append(self._index_line(name, chunk, data_offset, length))
+                        offset = data_offset + length
+            with open(os.path.join(self.path, "index.jsonl"), "w", encoding="utf-8") as f:
+                f.writelines(lines)
+        return len(self.index)
+
+    def _index_line(self, name, chunk, offset, length):
+        entry = {"name": name, "chunk": chunk, "offset": offset, "length": length, "time": time.time()}
+        return json.dumps(entry) + "\n"
+
+    def _open_writers(self, size):
+        if self.chunk_file is None:
+            chunks = self._chunks()
+            self.chunk = chunks[-1] if chunks else 0
+            self.chunk_file = open(self._chunk_path(self.chunk), "ab")
+        if self.index_file is None:
+            self.index_file = open(os.path.join(self.path, "index.jsonl"), "a", encoding="utf-8")
+        # start the next chunk when this one would go over the limit (a chunk is never left empty)
+        if self.chunk_file.tell() and self.chunk_file.tell() + size > self.chunk_bytes:
+            self.chunk_file.close()
+            self.chunk += 1
+            self.chunk_file = open(self._chunk_path(self.chunk), "ab")
+
+    def _close_writers(self):
+        if self.chunk_file is not None:
+            self.chunk_file.close()
+            self.chunk_file = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+    def append(self, name, data):
+        """Add an image's encoded bytes under name (e.g. its relative file path)"""
+        encoded_name = name.encode("utf-8")
+        record_size = HEADER_SIZE + len(encoded_name) + len(data)
+        with self.lock:
+            self._open_writers(record_size)
+            offset = self.chunk_file.tell() + HEADER_SIZE + len(encoded_name)
+            self.chunk_file.write(RECORD_MAGIC + len(encoded_name).to_bytes(4, "big")
+                                  + len(data).to_bytes(8, "big") + encoded_name)
+            self.chunk_file.write(data)
+            self.chunk_file.flush()
+            if self.sync:
+                os.fsync(self.chunk_file.fileno())
+            # the index line goes in only once the bytes are on disk
+            self.index_file.write(self._index_line(name, self.chunk, offset, len(data)))
+            self.index_file.flush()
+            if self.sync:
+                os.fsync(self.index_file.fileno())
+            self.index[name] = (self.chunk, offset, len(data))
+
+    def _map(self, chunk, end):
+        mapped = self.maps.get(chunk)
+        if mapped is None or len(mapped) < end:
+            # map (again) when the chunk has grown since it was last mapped
+            if mapped is not None:
+                mapped.close()
+            with open(self._chunk_path(chunk), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[chunk] = mapped
+        return mapped
+
+    def read(self, name):
+        """Encoded bytes of one image"""
+        with self.lock:
+            chunk, offset, length = self.index[name]
+            return self._map(chunk, offset + length)[offset:offset + length]
+
+    def names(self, pattern=None):
+        names = sorted(self.index)
+        if pattern:
+            names = [name for name in names if fnmatch.fnmatch(name, pattern)]
+        return names
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def export(self, out_dir, pattern=None):
+        """Write images back out as loose files (names are relative paths under out_dir)"""
+        paths = []
+        for name in self.names(pattern):
+            path = os.path.join(out_dir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(self.read(name))
+            paths.append(path)
+        return paths
+
+    def close(self):
+        with self.lock:
+            if self.chunk_file is not None:
+                os.fsync(self.chunk_file.fileno())
+            if self.index_file is not None:
+                os.fsync(self.index_file.fileno())
+            self._close_writers()
+            for mapped in self.maps.values():
+                mapped.close()
+            self.maps = {}
+
+
+class ArchiveSink:
+    """Writer sink for ImageWriterPipeline that appends to one archive per tool instead of
+    creating a file per image
+
+    Image paths are stored by their path relative to base_dir, and the tool is taken from
+    the "T<tool>_FL" part of that path, so both stations' folder layouts work unchanged.
+    """
+
+    def __init__(self, archive_dir, base_dir, **options):
+        self.archive_dir = archive_dir
+        self.base_dir = base_dir
+        self.options = options
+        self.lock = threading.Lock()
+        self.archives = {}
+
+    def name_for(self, file_path):
+        return os.path.relpath(file_path, self.base_dir).replace(os.sep, "/")
+
+    def archive_for(self, file_path):
+        match = re.search(r"T([^_/\\]+)_FL", file_path)
+        tool = match.group(1) if match else "unknown"
+        with self.lock:
+            archive = self.archives.get(tool)
+            if archive is None:
+                archive = ToolArchive(os.path.join(self.archive_dir, f"T{tool}"), **self.options)
+                self.archives[tool] = archive
+        return archive
+
+    def write(self, file_path, data):
+        self.archive_for(file_path).append(self.name_for(file_path), data)
+
+    def read(self, file_path):
+        return self.archive_for(file_path).read(self.name_for(file_path))
+
+    def contains(self, file_path):
+        return self.name_for(file_path) in self.archive_for(file_path)
+
+    def close(self):
+        with self.lock:
+            for archive in self.archives.values():
+                archive.close()
+            self.archives = {}
+
+
+def pack(source_dir, archive, pattern="*.jpg"):
+    """Move existing loose images under source_dir into an archive (files are kept)"""
+    count = 0
+    for root, _, files in os.walk(source_dir):
+        for filename in sorted(files):
+            if fnmatch.fnmatch(filename, pattern):
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    archive.append(os.path.relpath(path, source_dir).replace(os.sep, "/"), f.read())
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, export or create per-tool image archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="list the images in an archive")
+    listing.add_argument("archive")
+    listing.add_argument("--match", help="only names matching this pattern (e.g. '*side1*')")
+    export = commands.add_parser("export", help="write images back out as loose files")
+    export.add_argument("archive")
+    export.add_argument("out_dir")
+    export.add_argument("--match", help="only names matching this pattern")
+    packing = commands.add_parser("pack", help="add a folder of loose images to an archive")
+    packing.add_argument("source_dir")
+    packing.add_argument("archive")
+    rebuild = commands.add_parser("rebuild", help="recreate the index from the chunk files")
+    rebuild.add_argument("archive")
+    args = parser.parse_args()
+
+    if args.command != "pack" and not os.path.isdir(args.archive):
+        raise SystemExit(f"No archive at {args.archive}")
+    archive = ToolArchive(args.archive)
+    try:
+        if args.command == "list":
+            for name in archive.names(args.match):
+                print(f"{archive.index[name][2]:10d}  {name}")
+            print(f"{len(archive)} images")
+        elif args.command == "export":
+            paths = archive.export(args.out_dir, args.match)
+            print(f"Exported {len(paths)} images to {args.out_dir}")
+        elif args.command == "pack":
+            print(f"Added {pack(args.source_dir, archive)} images to {args.archive}")
+        elif args.command == "rebuild":
+            print(f"Indexed {archive.rebuild_index()} images")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
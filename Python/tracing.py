@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+import functools
+
+
+class _NullSpan:
+    # shared do-nothing span handed out while tracing is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """Collects timed spans for one run and writes them out as a Chrome/Perfetto trace
+
+    While disabled, span() returns a shared no-op context manager, so leaving the
+    instrumentation in place costs one attribute check per span.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = []
+        self.origin = time.perf_counter()
+        self.thread_names = {}
+
+    def start(self):
+        """Forget any previous run and start recording"""
+        with self.lock:
+            self.events = []
+            self.thread_names = {}
+            self.origin = time.perf_counter()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def _record(self, name, start, end, args):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def summary(self):
+        """Total seconds and call count per span name"""
+        totals = {}
+        with self.lock:
+            for event in self.events:
+                total = totals.setdefault(event["name"], {"count": 0, "seconds": 0.0})
+                total["count"] += 1
+                total["seconds"] += event["dur"] / 1e6
+        return totals
+
+    def export_chrome(self, path):
+        """Write the recorded spans as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)"""
+        with self.lock:
+            events = list(self.events)
+            names = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self.thread_names.items()
+            ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+# one tracer for the whole process, instrumented code calls tracer.span(...)
+tracer = Tracer()
+
+
+def span(name, **args):
+    return tracer.span(name, **args)
+
+
+def traced(name):
+    """Decorator: record every call of the function as a span"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
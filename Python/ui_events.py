@@ -0,0 +1,103 @@
+import time
+import threading
+from collections import deque
+
+
+class ProgressEstimator:
+    """ETA for a run from how long the finished steps took"""
+
+    def __init__(self):
+        self.start = None
+
+    def reset(self):
+        self.start = time.perf_counter()
+
+    def eta(self, done, total):
+        """Seconds left (None until at least one step is done)"""
+        if self.start is None or done <= 0 or total <= 0:
+            return None
+        elapsed = time.perf_counter() - self.start
+        return elapsed / done * max(0, total - done)
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d} left" if minutes else f"{seconds} s left"
+
+
+class UIEventChannel:
+    """Lets worker threads update a Tk window without touching Tk themselves
+
+    Workers post() events from any thread; the Tk loop drains them every interval_ms with
+    after(). Between two drains only the newest status message and the newest progress
+    update are kept (a burst of updates costs one redraw), while call events all run, in order.
+    """
+
+    def __init__(self, window, interval_ms=50):
+        self.window = window
+        self.interval_ms = interval_ms
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.handlers = {}
+        self.running = False
+        # status messages that never got drawn because a newer one replaced them
+        self.merged = 0
+
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def post(self, kind, *args):
+        with self.lock:
+            self.events.append((kind, args))
+
+    def status(self, message):
+        self.post("status", message)
+
+    def progress(self, done, total, message=None):
+        self.post("progress", done, total, message)
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the Tk thread"""
+        self.post("call", fn, *args)
+
+    def start(self):
+        self.running = True
+        self.window.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        self.running = False
+
+    def drain(self):
+        """Handle everything posted so far (call on the Tk thread)"""
+        with self.lock:
+            events, self.events = self.events, deque()
+
+        latest = {}
+        calls = []
+        for kind, args in events:
+            if kind == "call":
+                calls.append(args)
+            else:
+                if kind == "status" and "status" in latest:
+                    self.merged += 1
+                # re-inserted so the kinds are applied in the order of their newest post
+                latest.pop(kind, None)
+                latest[kind] = args
+        # status and progress first, so a dialog opened by a call sees the window up to date
+        for kind, args in latest.items():
+            handler = self.handlers.get(kind)
+            if handler is not None:
+                handler(*args)
+        for fn, *call_args in calls:
+            fn(*call_args)
+
+    def _drain(self):
+        if not self.running:
+            return
+        try:
+            self.drain()
+        except Exception as e:
+            print(f"UI event error: {e}")
+        self.window.after(self.interval_ms, self._drain)